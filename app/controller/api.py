@@ -1,16 +1,84 @@
+import atexit
+import os
 from flask import Flask
 from app.routes import routes
+from app.model.library_cache import library_cache
+from app.model.writer import GroupCommitWriter
+
+
+def start_writer():
+    """
+    Starts a group-commit writer if KINDLE_GROUP_COMMIT_MS is set.
+
+    Returns:
+        GroupCommitWriter: The running writer, or None if group commit is disabled.
+    """
+    # Coalesce saves in a background writer, flushing every N milliseconds.
+    if not os.environ.get("KINDLE_GROUP_COMMIT_MS"):
+        return None
+    return GroupCommitWriter(
+        interval=float(os.environ["KINDLE_GROUP_COMMIT_MS"]) / 1000,
+        batch_size=int(os.environ.get("KINDLE_GROUP_COMMIT_BATCH", 64)),
+    )
 
 
 def Start():
+    # Library files; a path ending in .db, .sqlite or .sqlite3 uses SQLite.
+    routes.global_json = os.environ.get("KINDLE_GLOBAL_LIBRARY", routes.global_json)
+    routes.user_json = os.environ.get("KINDLE_USER_LIBRARY", routes.user_json)
+
+    # Append mutations to a journal instead of rewriting the data files.
+    if os.environ.get("KINDLE_JOURNAL"):
+        library_cache.configure(journal=True)
+
+    # Load libraries from a binary snapshot kept next to the JSON file.
+    if os.environ.get("KINDLE_SNAPSHOT"):
+        library_cache.configure(snapshot=True)
+
     # Initialize the Flask app
     app = Flask(__name__)
 
     # Register routes
     routes.register_routes(app)
 
+    host = os.environ.get("KINDLE_HOST", "0.0.0.0")
+    port = int(os.environ.get("KINDLE_PORT", 5000))
+
+    # Pre-forking production server with N worker processes.
+    if os.environ.get("KINDLE_WORKERS"):
+        from app.controller.server import serve
+
+        serve(
+            app,
+            host,
+            port,
+            workers=int(os.environ["KINDLE_WORKERS"]),
+            threads=int(os.environ.get("KINDLE_THREADS", 4)),
+            preload=(routes.global_json, routes.user_json),
+            make_writer=start_writer,
+        )
+        return
+
+    writer = start_writer()
+    if writer is not None:
+        atexit.register(writer.close)
+        library_cache.configure(writer=writer)
+
+    # Async server running the routes in bounded read and write thread pools.
+    if os.environ.get("KINDLE_ASGI"):
+        from app.controller.asgi import serve
+
+        serve(
+            app,
+            host,
+            port,
+            read_threads=int(os.environ.get("KINDLE_READ_THREADS", 32)),
+            write_threads=int(os.environ.get("KINDLE_WRITE_THREADS", 4)),
+        )
+        return
+
     # For debugging locally
     # app.run(debug=True, host='0.0.0.0',port=5000)
 
-    # For production
-    app.run(host="0.0.0.0", port=5000)
+    # For development
+    app.run(host=host, port=port)
@@ -0,0 +1,202 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+# Methods that only read libraries; everything else runs in the write pool.
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ThreadPoolASGI:
+    """
+    ASGI adapter running a WSGI app (the Flask blueprint) in bounded thread pools.
+
+    Requests that only read go to one pool and requests that change a library to
+    another, so a burst of writes cannot take every thread away from GETs.
+    Saves copy the library under its lock and write it after releasing the
+    lock, so a slow save does not hold up reads either.
+
+    The event loop itself only moves bytes: request bodies are read before the
+    WSGI call and response chunks are pulled from the WSGI iterator in the same
+    pool, so streamed responses stay streamed.
+    """
+
+    def __init__(self, wsgi_app, read_threads: int = 32, write_threads: int = 4):
+        """
+        Initializes the adapter.
+
+        Args:
+            wsgi_app: The WSGI application, e.g. a Flask app.
+            read_threads (int, optional): Threads serving GET, HEAD and OPTIONS
+                requests. Defaults to 32.
+            write_threads (int, optional): Threads serving every other request.
+                Defaults to 4.
+        """
+        self.wsgi_app = wsgi_app
+        self.read_pool = ThreadPoolExecutor(read_threads, "asgi-read")
+        self.write_pool = ThreadPoolExecutor(write_threads, "asgi-write")
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "websocket":
+            # The routes are plain HTTP; turn WebSocket handshakes down.
+            if (await receive())["type"] == "websocket.connect":
+                await send({"type": "websocket.close"})
+            return
+        if scope["type"] != "http":
+            return
+
+        body = BytesIO()
+        while True:
+            message = await receive()
+            body.write(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        pool = self.read_pool if scope["method"] in READ_METHODS else self.write_pool
+        status, headers, chunks = await loop.run_in_executor(
+            pool, self.start_response, self.environ(scope, body)
+        )
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        try:
+            while True:
+                chunk = await loop.run_in_executor(pool, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        finally:
+            if hasattr(chunks, "close"):
+                await loop.run_in_executor(pool, chunks.close)
+        await send({"type": "http.response.body", "body": b""})
+
+    async def lifespan(self, receive, send) -> None:
+        """Answers server startup and shuts the thread pools down on exit."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.read_pool.shutdown(wait=True)
+                self.write_pool.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def start_response(self, environ: dict) -> tuple:
+        """
+        Calls the WSGI app up to its first response chunk, in a pool thread.
+
+        Args:
+            environ (dict): The WSGI environment of the request.
+
+        Returns:
+            tuple: The status code, the ASGI headers and an iterator over the
+            body chunks.
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+
+        result = self.wsgi_app(environ, start_response)
+        chunks = iter(result)
+        first = next(chunks, b"")  # WSGI apps may call start_response lazily.
+        return response["status"], response["headers"], _Prepend(first, chunks, result)
+
+    @staticmethod
+    def environ(scope: dict, body: BytesIO) -> dict:
+        """
+        Builds the WSGI environment of an ASGI HTTP request.
+
+        Args:
+            scope (dict): The ASGI connection scope.
+            body (BytesIO): The complete request body.
+
+        Returns:
+            dict: The WSGI environment.
+        """
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+            # scope["path"] is already percent-decoded.
+            "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin1").upper().replace("-", "_")
+            value = value.decode("latin1")
+            if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+                environ[name] = value
+                continue
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+class _Prepend:
+    """Iterator yielding an already-read first chunk before the rest of a WSGI body."""
+
+    def __init__(self, first: bytes, chunks, result):
+        self.first = first
+        self.chunks = chunks
+        self.result = result
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self.first is not None:
+            first, self.first = self.first, None
+            return first
+        return next(self.chunks)
+
+    def close(self) -> None:
+        if hasattr(self.result, "close"):
+            self.result.close()
+
+
+def serve(app, host: str, port: int, read_threads: int, write_threads: int) -> None:
+    """
+    Runs the app behind ThreadPoolASGI on uvicorn until it is stopped.
+
+    Args:
+        app (Flask): The WSGI application to serve.
+        host (str): Interface to listen on.
+        port (int): Port to listen on.
+        read_threads (int): Threads serving read requests.
+        write_threads (int): Threads serving write requests.
+    """
+    import uvicorn
+
+    uvicorn.run(
+        ThreadPoolASGI(app, read_threads, write_threads),
+        host=host,
+        port=port,
+        log_level="warning",
+    )
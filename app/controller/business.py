@@ -1,4 +1,13 @@
-from app.model import kindle_model
+import base64
+import builtins
+import hashlib
+import json
+import secrets
+from datetime import datetime, timezone
+
+from app.model import kindle_model, query
+from app.model.library_cache import get_library, library_cache
+from app.controller.cache import catalog_cache, search_cache
 from app.controller.exceptions import (
     ValidationError,
     BookNotFoundError,
@@ -19,6 +28,32 @@ ALLOWED_KEYS = [
     "language",
 ]
 
+RANGE_KEYS = list(kindle_model.RANGE_INDEX_FIELDS)
+
+QUERY_KEYS = list(kindle_model.BOOK_FIELDS)
+
+FUZZY_KEYS = list(kindle_model.FUZZY_FIELDS)
+
+SUGGEST_KEYS = list(kindle_model.SUGGEST_FIELDS)
+
+FACET_KEYS = list(kindle_model.FACET_FIELDS)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# Books fetched per page while streaming a whole library.
+STREAM_BATCH_SIZE = 500
+
+# Tells ETags of one server run from those of the next. Drawn at import, so
+# workers forked from a preloading server share it.
+BOOT_ID = secrets.token_hex(8)
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 100
+
+# UUIDs accepted by one bulk add.
+MAX_BULK_BOOKS = 1000
+
 REQUIRED_KEYS = [
     "author",
     "country",
@@ -81,53 +116,284 @@ def validate_json(json_data) -> None:
         raise ValidationError(f"Invalid JSON. {' '.join(error_messages)}")
 
 
-def list_books(library_path: str) -> dict:
+def parse_number(value, name: str):
     """
-    Find a book in a library based on a given key and value.
+    Parse an optional numeric query parameter.
 
     Args:
-        key (str): Key to search by.
-        value (str): Value of the key to match.
-        library_path (str): Path to the library's data file.
-        target (str, optional): Target attribute. Defaults to None.
+        value (str): Raw parameter value, or None.
+        name (str): Parameter name, used in the error message.
 
     Returns:
-        dict: Dictionary containing the status and the found book details.
+        float: The parsed number, or None if no value was given.
 
     Raises:
-        ValidationError: If the key or target is not valid.
-        BookNotFoundError: If no books match the criteria.
+        ValidationError: If the value is not a number.
     """
-    ...
-    library_instance = kindle_model.Library(library_path)
-    return {"status": "success", "Books": library_instance.list_books()}
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, builtins.ValueError):
+        raise ValidationError(f"{name} must be a number.")
 
 
-def find_book(key: str, value: str, library_path: str, target=None) -> dict:
+def parse_page(offset, limit) -> tuple[int, int]:
+    """
+    Parse and bound the offset/limit pagination parameters.
+
+    Args:
+        offset (str): Number of results to skip, or None.
+        limit (str): Maximum number of results, or None.
+
+    Returns:
+        tuple[int, int]: The offset and the limit.
+
+    Raises:
+        ValidationError: If the offset is not a non-negative integer or the limit
+            not a positive one.
+    """
+    try:
+        offset = int(offset) if offset is not None else 0
+        limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+    except builtins.ValueError:
+        raise ValidationError("offset and limit must be integers.")
+    if offset < 0:
+        raise ValidationError("offset must not be negative.")
+    if limit < 1:
+        raise ValidationError("limit must be at least 1.")
+    return offset, min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(fields):
+    """
+    Parse the comma-separated fields query parameter.
+
+    Args:
+        fields (str): Attribute names such as "uuid,title,author", or None.
+
+    Returns:
+        tuple[str, ...]: The requested attributes, or None for all of them.
+
+    Raises:
+        ValidationError: If an attribute is not a book attribute.
+    """
+    if fields is None:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",")))
+    unknown = [name for name in names if name not in QUERY_KEYS]
+    if unknown or not names:
+        raise ValidationError(
+            f"Invalid fields. Allowed fields are {', '.join(QUERY_KEYS)}."
+        )
+    return names
+
+
+def encode_cursor(load_id: str, position: tuple[int, str]) -> str:
+    """
+    Turn the position of the last book of a page into an opaque cursor.
+
+    Args:
+        load_id (str): The load_id of the library the position was read from.
+        position (tuple[int, str]): Sequence number and UUID of the book.
+
+    Returns:
+        str: URL-safe cursor for the next page.
+    """
+    raw = json.dumps([load_id, *position], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int, str]:
+    """
+    Recover the position encoded by encode_cursor.
+
+    Args:
+        cursor (str): Cursor from a previous page.
+
+    Returns:
+        tuple[str, int, str]: Load id of the library, and sequence number and
+        UUID of the last book of that page.
+
+    Raises:
+        ValidationError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        load_id, seq, uuid = json.loads(raw)
+        if not all(
+            isinstance(value, kind)
+            for value, kind in ((load_id, str), (seq, int), (uuid, str))
+        ):
+            raise builtins.ValueError(cursor)
+    except (builtins.ValueError, TypeError):
+        raise ValidationError("Invalid cursor.")
+    return load_id, seq, uuid
+
+
+def iter_books(library_instance, fields=None, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Yield every book of a library in insertion order, one page at a time.
+
+    Only one page of dictionaries exists at any moment, and the library lock is
+    only held while a page is fetched. Pages follow the same cursor positions as
+    list_books, so books added or removed while streaming do not shift the rest.
+
+    Args:
+        library_instance (Library): The library to read.
+        fields (tuple[str, ...], optional): Attributes to build for each book.
+            Defaults to None (all).
+        batch_size (int, optional): Books per page. Defaults to STREAM_BATCH_SIZE.
+
+    Yields:
+        dict: One book.
+    """
+    after_seq, after_uuid = None, None
+    while True:
+        page, last = library_instance.list_books_page(
+            batch_size, after_uuid=after_uuid, after_seq=after_seq, fields=fields
+        )
+        yield from page
+        if last is None:
+            return
+        after_seq, after_uuid = last
+
+
+def list_books(library_path: str, limit=None, cursor=None, fields=None) -> dict:
+    """
+    List the books of a library in insertion order.
+
+    Without limit or cursor the whole library is returned, as a generator so
+    the response can be streamed. Otherwise a single page is returned along with
+    next_cursor, to pass back as cursor for the following page, or None on the
+    last page.
+
+    A cursor resumes after the last book of its page, which keeps its place
+    across reloads because books stay in insertion order. If that book was
+    removed, only the load of the library that issued the cursor knows its
+    position; any other load rejects the cursor.
+
+    Args:
+        library_path (str): Path to the library's data file.
+        limit (str, optional): Page size. Defaults to None (DEFAULT_PAGE_SIZE when
+            paginating); capped at MAX_PAGE_SIZE.
+        cursor (str, optional): next_cursor of the previous page. Defaults to None.
+        fields (str, optional): Comma-separated attributes to return for each book.
+            Defaults to None (all).
+
+    Returns:
+        dict: Dictionary containing the status, the books and the next cursor if paginating.
+
+    Raises:
+        ValidationError: If the limit, cursor or fields are not valid, or the
+            cursor has expired.
+    """
+    fields = parse_fields(fields)
+    library_instance = get_library(library_path)
+    if limit is None and cursor is None:
+        return {"status": "success", "Books": iter_books(library_instance, fields)}
+
+    _, limit = parse_page(None, limit)
+    load_id, after_seq, after_uuid = decode_cursor(cursor) if cursor else (None,) * 3
+    if load_id != library_instance.load_id:
+        after_seq = None  # Numbered by another load, e.g. in another worker.
+    try:
+        books, last = library_instance.list_books_page(
+            limit, after_uuid=after_uuid, after_seq=after_seq, fields=fields
+        )
+    except KeyError:
+        raise ValidationError(
+            "Cursor expired: its book was removed. Start again without a cursor."
+        )
+    return {
+        "status": "success",
+        "Books": books,
+        "next_cursor": encode_cursor(library_instance.load_id, last) if last else None,
+    }
+
+
+def find_book(
+    key: str,
+    value: str,
+    library_path: str,
+    target=None,
+    fuzzy: bool = False,
+    fields=None,
+) -> dict:
     """
     Find a book in a library based on a given key and value.
 
+    Results (including misses) are cached per library generation, so repeated
+    searches skip the lookup until the library changes.
+
     Args:
         key (str): Key to search by.
         value (str): Value of the key to match.
         library_path (str): Path to the library's data file.
         target (str, optional): Target attribute. Defaults to None.
+        fuzzy (bool, optional): Tolerate typos, ranking the closest matches first.
+            Only FUZZY_KEYS can be searched this way. Defaults to False.
+        fields (str, optional): Comma-separated attributes to return for each book.
+            Ignored when a target is given. Defaults to None (all).
 
     Returns:
         dict: Dictionary containing the status and the found book details.
 
     Raises:
-        ValidationError: If the key or target is not valid.
+        ValidationError: If the key, target or fields are not valid.
         BookNotFoundError: If no books match the criteria.
     """
 
     validate_keys(target)
     validate_keys(key)
+    fields = (target,) if target in QUERY_KEYS else parse_fields(fields)
+    if fuzzy and key not in FUZZY_KEYS:
+        raise ValidationError(
+            f"Invalid key. Allowed keys for fuzzy search are {', '.join(FUZZY_KEYS)}."
+        )
 
-    library_instance = kindle_model.Library(library_path)
-    found = library_instance.find_books(**{key: value})
-    if not found:
+    library_instance = get_library(library_path)
+    cache_key = (library_instance.data_file, key, value, target, fuzzy, fields)
+    generation = library_instance.generation
+    response = search_cache.get(cache_key, generation, default=False)
+    if response is False:
+        response = search_book(library_instance, key, value, target, fuzzy, fields)
+        search_cache.put(cache_key, generation, response)
+
+    if response is None:
         raise BookNotFoundError("No books found matching the criteria.")
+    return response
+
+
+def search_book(
+    library_instance,
+    key: str,
+    value: str,
+    target=None,
+    fuzzy: bool = False,
+    fields=None,
+):
+    """
+    Run a single key/value search and build the find_book response.
+
+    Args:
+        library_instance (Library): The library to search.
+        key (str): Key to search by.
+        value (str): Value of the key to match.
+        target (str, optional): Target attribute. Defaults to None.
+        fuzzy (bool, optional): Tolerate typos. Defaults to False.
+        fields (tuple[str, ...], optional): Attributes to build for each book.
+            Defaults to None (all).
+
+    Returns:
+        dict: The response, or None if no books match.
+    """
+    if fuzzy:
+        found = library_instance.fuzzy_find_books(key, value, fields=fields)
+    else:
+        found = library_instance.find_books(fields=fields, **{key: value})
+    if not found:
+        return None
 
     if target:
         return {target: book[target] for book in found if target in book}
@@ -135,6 +401,172 @@ def find_book(key: str, value: str, library_path: str, target=None) -> dict:
     return {"status": "success", "book found": found}
 
 
+def suggest_books(key: str, prefix: str, library_path: str, k=None) -> dict:
+    """
+    Complete a prefix from the titles or authors of a library.
+
+    Args:
+        key (str): Attribute to complete, one of SUGGEST_KEYS.
+        prefix (str): What has been typed so far.
+        library_path (str): Path to the library's data file.
+        k (str, optional): Maximum number of completions. Defaults to None
+            (DEFAULT_SUGGESTIONS); capped at MAX_SUGGESTIONS.
+
+    Returns:
+        dict: Dictionary containing the status and the completions, possibly none.
+
+    Raises:
+        ValidationError: If the key or k is not valid.
+    """
+    if key not in SUGGEST_KEYS:
+        raise ValidationError(
+            f"Invalid key. Allowed keys for suggestions are {', '.join(SUGGEST_KEYS)}."
+        )
+    try:
+        k = int(k) if k is not None else DEFAULT_SUGGESTIONS
+    except builtins.ValueError:
+        raise ValidationError("k must be an integer.")
+    if k < 1:
+        raise ValidationError("k must be positive.")
+
+    library_instance = get_library(library_path)
+    suggestions = library_instance.suggest(key, prefix, min(k, MAX_SUGGESTIONS))
+    return {"status": "success", "suggestions": suggestions}
+
+
+def find_books_range(
+    key: str, library_path: str, low=None, high=None, offset=None, limit=None
+) -> dict:
+    """
+    Find the books of a library whose numeric attribute lies within a range.
+
+    Args:
+        key (str): Numeric attribute to filter on, one of RANGE_KEYS.
+        library_path (str): Path to the library's data file.
+        low (str, optional): Inclusive lower bound. Defaults to None.
+        high (str, optional): Inclusive upper bound. Defaults to None.
+        offset (str, optional): Number of matching books to skip. Defaults to None.
+        limit (str, optional): Maximum number of books to return. Defaults to None.
+
+    Returns:
+        dict: Dictionary containing the status, the total match count and the page of books.
+
+    Raises:
+        ValidationError: If the key, bounds or pagination parameters are not valid.
+        BookNotFoundError: If no books lie within the range.
+    """
+    if key not in RANGE_KEYS:
+        raise ValidationError(
+            f"Invalid key. Allowed keys for range queries are {', '.join(RANGE_KEYS)}."
+        )
+    low = parse_number(low, "min")
+    high = parse_number(high, "max")
+    offset, limit = parse_page(offset, limit)
+
+    library_instance = get_library(library_path)
+    books, total = library_instance.find_books_range(
+        key, low, high, offset=offset, limit=limit
+    )
+    if not total:
+        raise BookNotFoundError("No books found matching the criteria.")
+
+    return {
+        "status": "success",
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "books": books,
+    }
+
+
+def parse_predicates(query_text: str) -> list:
+    """
+    Parse conditions joined by AND and check that they name book attributes.
+
+    Args:
+        query_text (str): Conditions such as "author~=Tolstoy AND year>=1850".
+
+    Returns:
+        list[Predicate]: One predicate per condition.
+
+    Raises:
+        ValidationError: If the query cannot be parsed or uses an unknown key.
+    """
+    try:
+        predicates = query.parse_query(query_text)
+    except builtins.ValueError as e:
+        raise ValidationError(str(e))
+    for predicate in predicates:
+        if predicate.key not in QUERY_KEYS:
+            raise ValidationError(
+                f"Invalid key {predicate.key}. Allowed keys are {', '.join(QUERY_KEYS)}."
+            )
+    return predicates
+
+
+def facet_books(library_path: str, by=None, query_text=None) -> dict:
+    """
+    Count the books of a library per language, country or decade.
+
+    Args:
+        library_path (str): Path to the library's data file.
+        by (str, optional): Comma-separated facets from FACET_KEYS. Defaults to
+            None (all of them).
+        query_text (str, optional): Conditions joined by AND, as for query_books,
+            restricting the books counted. Defaults to None (every book).
+
+    Returns:
+        dict: Dictionary containing the status, the number of books counted and
+        the value counts of each facet, most common first.
+
+    Raises:
+        ValidationError: If a facet or the query is not valid.
+    """
+    fields = FACET_KEYS
+    if by is not None:
+        fields = list(dict.fromkeys(name.strip() for name in by.split(",")))
+        if not fields or any(field not in FACET_KEYS for field in fields):
+            raise ValidationError(
+                f"Invalid facet. Allowed facets are {', '.join(FACET_KEYS)}."
+            )
+    predicates = parse_predicates(query_text) if query_text else None
+
+    library_instance = get_library(library_path)
+    facets, total = library_instance.facets(fields, predicates)
+    return {"status": "success", "total": total, "facets": facets}
+
+
+def query_books(query_text: str, library_path: str, explain: bool = False) -> dict:
+    """
+    Find the books of a library matching several conditions joined by AND.
+
+    Args:
+        query_text (str): Conditions such as "author~=Tolstoy AND year>=1850".
+        library_path (str): Path to the library's data file.
+        explain (bool, optional): Include the chosen query plan. Defaults to False.
+
+    Returns:
+        dict: Dictionary containing the status, the found books and optionally the plan.
+
+    Raises:
+        ValidationError: If the query cannot be parsed or uses an unknown key.
+        BookNotFoundError: If no books match and no plan was requested.
+    """
+    if not query_text:
+        raise ValidationError("Missing query parameter q.")
+    predicates = parse_predicates(query_text)
+
+    library_instance = get_library(library_path)
+    found, plan = library_instance.query(predicates)
+    if not found and not explain:
+        raise BookNotFoundError("No books found matching the criteria.")
+
+    response = {"status": "success", "book found": found}
+    if explain:
+        response["plan"] = plan
+    return response
+
+
 def add_book_user(
     book_uuid: str, global_library_path: str, user_library_path: str
 ) -> dict:
@@ -153,19 +585,77 @@ def add_book_user(
         ValidationError: If the book is already in the user's library.
         BookNotFoundError: If the book isn't found in the global library.
     """
-    user_library_instance = kindle_model.Library(user_library_path)
-    global_library_instance = kindle_model.Library(global_library_path)
-    found_user = user_library_instance.find_books(uuid=book_uuid)
-    if found_user:
-        raise ValidationError("Book already exists in the user's library.")
-    found_global = global_library_instance.find_books(uuid=book_uuid)
-    if not found_global:
-        raise BookNotFoundError("Book not found in the global library.")
-    book_to_add = kindle_model.Book.from_json(found_global[0])
-    user_library_instance.add_book(book_to_add)
+    user_library_instance = get_library(user_library_path)
+    global_library_instance = get_library(global_library_path)
+    with user_library_instance.writing():
+        found_user = user_library_instance.find_books(uuid=book_uuid)
+        if found_user:
+            raise ValidationError("Book already exists in the user's library.")
+        found_global = global_library_instance.find_books(uuid=book_uuid)
+        if not found_global:
+            raise BookNotFoundError("Book not found in the global library.")
+        book_to_add = kindle_model.Book.from_json(found_global[0])
+        user_library_instance.add_book(book_to_add, wait=False)
+    user_library_instance.sync()
     return {"status": "success", "book added": book_to_add.to_dict()}
 
 
+def add_books_user(
+    json: dict, global_library_path: str, user_library_path: str
+) -> dict:
+    """
+    Add several books to a user's library from the global library at once.
+
+    The UUIDs are looked up in one pass over each library's UUID index and every
+    book found is added with a single write. A UUID that cannot be added does
+    not fail the request; it is reported in the per-item results instead.
+
+    Args:
+        json (dict): Request body of the form {"uuids": [...]}.
+        global_library_path (str): Path to the global library's data file.
+        user_library_path (str): Path to the user's library data file.
+
+    Returns:
+        dict: Dictionary containing the status, the number of books added and
+        one result per UUID: "added", "duplicate", "already in library" or
+        "not found".
+
+    Raises:
+        ValidationError: If the body is not a list of at most MAX_BULK_BOOKS UUIDs.
+    """
+    uuids = json.get("uuids") if isinstance(json, dict) else None
+    if not isinstance(uuids, list) or not all(isinstance(u, str) for u in uuids):
+        raise ValidationError('Invalid JSON. Expected {"uuids": [...]}.')
+    if len(uuids) > MAX_BULK_BOOKS:
+        raise ValidationError(f"At most {MAX_BULK_BOOKS} books can be added at once.")
+
+    user_library_instance = get_library(user_library_path)
+    global_library_instance = get_library(global_library_path)
+    found_global = global_library_instance.find_books_by_uuid(uuids)
+    results = []
+    books_to_add = []
+    with user_library_instance.writing():
+        found_user = user_library_instance.find_books_by_uuid(uuids)
+        seen = set()
+        for book_uuid in uuids:
+            if book_uuid in seen:
+                status = "duplicate"
+            elif book_uuid in found_user:
+                status = "already in library"
+            elif book_uuid not in found_global:
+                status = "not found"
+            else:
+                status = "added"
+                books_to_add.append(
+                    kindle_model.Book.from_json(found_global[book_uuid])
+                )
+            seen.add(book_uuid)
+            results.append({"uuid": book_uuid, "status": status})
+        user_library_instance.add_books(books_to_add, wait=False)
+    user_library_instance.sync()
+    return {"status": "success", "added": len(books_to_add), "results": results}
+
+
 def add_book_global(json: dict, global_library_path: str) -> dict:
     """
     Add a book to a user's library from the global library using a given UUID.
@@ -182,7 +672,7 @@ def add_book_global(json: dict, global_library_path: str) -> dict:
     """
     validate_json(json)
     try:
-        global_library_instance = kindle_model.Library(global_library_path)
+        global_library_instance = get_library(global_library_path)
         new_book = kindle_model.Book(**json)
         global_library_instance.add_book(new_book)
 
@@ -210,61 +700,77 @@ def subtract_book_user(book_uuid: str, user_library_path: str) -> dict:
         BookNotFoundError: If the book isn't found in the user's library.
         BookRemovalError: If there's an issue removing the book.
     """
-    user_library_instance = kindle_model.Library(user_library_path)
-    book = user_library_instance.find_books(uuid=book_uuid)
+    user_library_instance = get_library(user_library_path)
+    with user_library_instance.writing():
+        book = user_library_instance.find_books(uuid=book_uuid)
 
-    if not book:
-        raise BookNotFoundError("Book not found in the user library.")
+        if not book:
+            raise BookNotFoundError("Book not found in the user library.")
 
-    try:
-        user_library_instance.remove_book(book_uuid)
-    except Exception as e:  # Catch all exceptions from remove_book method.
-        raise BookRemovalError(
-            f"Failed to remove book with UUID {book_uuid}. Error: {str(e)}"
-        )
+        try:
+            user_library_instance.remove_book(book_uuid, wait=False)
+        except Exception as e:  # Catch all exceptions from remove_book method.
+            raise BookRemovalError(
+                f"Failed to remove book with UUID {book_uuid}. Error: {str(e)}"
+            )
+    user_library_instance.sync()
 
     return {"status": "success", "book removed": book}
 
 
-def find_top_book_user(user_library_path: str, target: str) -> dict:
+def find_top_book_user(user_library_path: str, target: str, k=None) -> dict:
     """
-    Remove a book from a user's library based on a given UUID.
+    Find the books of a user's library with the highest value of an attribute.
 
     Args:
         user_library_path (str): Path to the user's library data file.
+        target (str): Attribute to rank the books by.
+        k (str, optional): Number of books to return. Defaults to None, which
+            returns the single top book; capped at MAX_PAGE_SIZE.
 
     Returns:
-        dict: Dictionary containing the status and details of the removed book.
+        dict: Dictionary containing the status and the top book, or the list of
+        top books when k is given.
 
     Raises:
-        BookNotFoundError: If the book isn't found in the user's library.
-        BookRemovalError: If there's an issue removing the book.
+        ValidationError: If the target or k is not valid, or no book has the target.
+        BookNotFoundError: If the user's library is empty.
     """
     validate_keys(target)
-    user_library_instance = kindle_model.Library(user_library_path)
-    books_user = user_library_instance.list_books()
-
-    if not books_user:
+    if k is not None:
+        try:
+            k = int(k)
+        except builtins.ValueError:
+            raise ValidationError("k must be an integer.")
+        if k < 1:
+            raise ValidationError("k must be positive.")
+    user_library_instance = get_library(user_library_path)
+
+    if not len(user_library_instance):
         raise BookNotFoundError("No books in the user's library.")
 
-    # Ensure at least one book has the target attribute.
-    if not any(target in book for book in books_user):
+    try:
+        top_books = user_library_instance.top_books(
+            target, min(k, MAX_PAGE_SIZE) if k is not None else 1
+        )
+    except TypeError:
         raise ValidationError(
-            f"No books with the attribute: {target} found in the user's library."
+            f"Error finding the top book based on the attribute: {target}."
         )
 
-    try:
-        top_book = max(books_user, key=lambda book: book.get(target, float("-inf")))
-    except ValueError:
+    # Ensure at least one book has the target attribute.
+    if not top_books:
         raise ValidationError(
-            f"Error finding the top book based on the attribute: {target}."
+            f"No books with the attribute: {target} found in the user's library."
         )
 
-    return {"status": "success", f"Highest Value {target}": top_book}
+    if k is None:
+        return {"status": "success", f"Highest Value {target}": top_books[0]}
+    return {"status": "success", f"Highest Values {target}": top_books}
 
 
 def change_book_page_user(
-    book_uuid: str, page_number: int, user_library_path: str
+    book_uuid: str, page_number: int, user_library_path: str, wait: bool = True
 ) -> dict:
     """
     Remove a book from a user's library based on a given UUID.
@@ -272,6 +778,7 @@ def change_book_page_user(
     Args:
         book_uuid (str): UUID of the book to remove.
         user_library_path (str): Path to the user's library data file.
+        wait (bool, optional): Wait until the update is on disk. Defaults to True.
 
     Returns:
         dict: Dictionary containing the status and details of the removed book.
@@ -287,27 +794,83 @@ def change_book_page_user(
     except ValueError:
         raise ValidationError("Page number must be an integer.")
 
-    user_library_instance = kindle_model.Library(user_library_path)
-    books = user_library_instance.find_books(uuid=book_uuid)
+    user_library_instance = get_library(user_library_path)
+    with user_library_instance.writing():
+        books = user_library_instance.find_books(uuid=book_uuid)
 
-    if not books:
-        raise BookNotFoundError(
-            "No book with the specified UUID exists in the user's library."
-        )
+        if not books:
+            raise BookNotFoundError(
+                "No book with the specified UUID exists in the user's library."
+            )
 
-    book = books[0]
-    if "pages" not in book:
-        raise ValidationError("The book does not have a 'pages' attribute.")
+        book = books[0]
+        if "pages" not in book:
+            raise ValidationError("The book does not have a 'pages' attribute.")
 
-    total_pages = book["pages"]
-    if total_pages is not None and page_number > total_pages:
-        raise ValidationError("Page number exceeds total pages of the book.")
+        total_pages = book["pages"]
+        if total_pages is not None and page_number > total_pages:
+            raise ValidationError("Page number exceeds total pages of the book.")
 
-    user_library_instance.update_reading_status(book_uuid, page_number)
+        user_library_instance.update_reading_status(book_uuid, page_number, wait=False)
 
-    updated_books = user_library_instance.find_books(uuid=book_uuid)
-    updated_book = updated_books[0]
+        updated_books = user_library_instance.find_books(uuid=book_uuid)
+        updated_book = updated_books[0]
 
-    if updated_book["last_read_page"] != page_number:
-        raise UpdateError(f"Page update for book:{book_uuid} failed.")
+        if updated_book["last_read_page"] != page_number:
+            raise UpdateError(f"Page update for book:{book_uuid} failed.")
+    user_library_instance.sync(wait)
     return {"status": "success", "book updated": books}
+
+
+def library_validators(library_path: str, variant: str) -> tuple:
+    """
+    Compute the HTTP cache validators of a response built from a library.
+
+    The ETag changes whenever the library's generation or the files backing
+    it do. Generation numbers restart with the process and diverge between
+    worker processes, so the files' stamp, the library's load_id and BOOT_ID
+    keep another worker or a restarted server from reissuing a tag for other
+    content. The library is taken from the shared cache, so nothing is
+    serialized.
+
+    Args:
+        library_path (str): Path to the library's data file.
+        variant (str): Everything else the response depends on, e.g. the
+            request path and query string.
+
+    Returns:
+        tuple[str, Optional[datetime]]: The ETag, and the modification time of
+        the data file if it exists.
+    """
+    library_instance = get_library(library_path)
+    # SQLite libraries keep their generation in the database, so need no stamp.
+    disk = getattr(library_instance, "stamp", None)
+    key = (
+        f"{BOOT_ID}:{library_instance.data_file}:{disk}:"
+        f"{library_instance.load_id}:{library_instance.generation}"
+    )
+    etag = hashlib.blake2b(f"{key}:{variant}".encode(), digest_size=16).hexdigest()
+    stamp = kindle_model.file_stamp(library_instance.data_file)
+    last_modified = None
+    if stamp is not None:
+        last_modified = datetime.fromtimestamp(stamp[0] / 1e9, timezone.utc)
+    return etag, last_modified
+
+
+def cache_stats() -> dict:
+    """
+    Report the counters of the shared caches and background writer.
+
+    Returns:
+        dict: Dictionary containing the status and the cache counters.
+    """
+    stats = {
+        "status": "success",
+        "library_cache": library_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "catalog_cache": catalog_cache.stats(),
+    }
+    writer = library_cache.options.get("writer")
+    if writer is not None:
+        stats["writer"] = writer.stats()
+    return stats
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache whose entries are stamped with a generation.
+
+    An entry is only served while the caller's current generation matches the one
+    it was stored with, so bumping a library's generation invalidates every result
+    computed from the old state without having to find and delete them.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initializes an empty cache.
+
+        Args:
+            maxsize (int, optional): Maximum number of entries. Defaults to 1024.
+        """
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key, generation, default=None):
+        """
+        Looks up an entry computed at the given generation.
+
+        Args:
+            key: The cache key.
+            generation: The current generation of the underlying data.
+            default (optional): Value returned on a miss. Defaults to None.
+
+        Returns:
+            The cached value, or default if missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] != generation:
+                del self._entries[key]
+                self.misses += 1
+                self.stale += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, generation, value) -> None:
+        """
+        Stores an entry, evicting the least recently used one when full.
+
+        Args:
+            key: The cache key.
+            generation: The generation of the data the value was computed from.
+            value: The value to cache.
+        """
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict: Size, hits, misses, stale entries dropped, evictions and hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+search_cache = LRUCache(maxsize=1024)
+
+# Encoded full-catalog responses; each entry holds one body per content coding.
+catalog_cache = LRUCache(maxsize=8)
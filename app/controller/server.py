@@ -0,0 +1,102 @@
+import gc
+
+from gunicorn.app.base import BaseApplication
+
+from app.model.library_cache import get_library, library_cache
+
+
+class ProductionServer(BaseApplication):
+    """
+    Pre-forking gunicorn server for the Flask app.
+
+    The libraries are loaded in the master process and the heap is frozen
+    before the workers fork, so every worker shares the catalog's pages
+    copy-on-write instead of loading its own copy. On SIGTERM the master stops
+    accepting connections and gives workers graceful_timeout seconds to finish
+    their requests and flush pending saves.
+    """
+
+    def __init__(
+        self,
+        app,
+        bind: str,
+        workers: int,
+        threads: int,
+        preload: tuple = (),
+        make_writer=None,
+        graceful_timeout: int = 30,
+    ):
+        """
+        Initializes the server.
+
+        Args:
+            app (Flask): The WSGI application to serve.
+            bind (str): Address to listen on, e.g. "0.0.0.0:5000".
+            workers (int): Number of worker processes.
+            threads (int): Number of request threads per worker.
+            preload (tuple, optional): Library paths to load before forking.
+                Defaults to ().
+            make_writer (callable, optional): Returns a GroupCommitWriter, or None,
+                for each worker. Writer threads do not survive fork, so every
+                worker starts its own. Defaults to None.
+            graceful_timeout (int, optional): Seconds workers get to drain on
+                SIGTERM. Defaults to 30.
+        """
+        self.application = app
+        self.preload = preload
+        self.make_writer = make_writer
+        self.writer = None
+        self.options = {
+            "bind": bind,
+            "workers": workers,
+            "threads": threads,
+            "worker_class": "gthread",
+            "preload_app": True,
+            "graceful_timeout": graceful_timeout,
+            "when_ready": self.when_ready,
+            "post_fork": self.post_fork,
+            "worker_exit": self.worker_exit,
+        }
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        """Loads the libraries in the master process, before any worker forks."""
+        for path in self.preload:
+            get_library(path)
+        return self.application
+
+    def when_ready(self, server) -> None:
+        """Moves everything loaded so far out of reach of the cyclic GC."""
+        gc.collect()
+        gc.freeze()
+
+    def post_fork(self, server, worker) -> None:
+        """Starts this worker's background writer, if group commit is enabled."""
+        if self.make_writer is not None:
+            self.writer = self.make_writer()
+            if self.writer is not None:
+                library_cache.attach_writer(self.writer)
+
+    def worker_exit(self, server, worker) -> None:
+        """Flushes the saves still queued in this worker before it exits."""
+        if self.writer is not None:
+            self.writer.close()
+
+
+def serve(app, host: str, port: int, workers: int, threads: int, **options) -> None:
+    """
+    Runs the app on a pre-forking gunicorn server until it is stopped.
+
+    Args:
+        app (Flask): The WSGI application to serve.
+        host (str): Interface to listen on.
+        port (int): Port to listen on.
+        workers (int): Number of worker processes.
+        threads (int): Number of request threads per worker.
+        **options: Further ProductionServer arguments (preload, make_writer).
+    """
+    ProductionServer(app, f"{host}:{port}", workers, threads, **options).run()
@@ -0,0 +1,618 @@
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+# Shortest query tolerated to contain a typo: one edit in fewer letters would
+# let most short words match.
+TYPO_MIN_LENGTH = 4
+
+
+@lru_cache(maxsize=65536)
+def normalize_text(text: str) -> str:
+    """
+    Folds case and strips accents, so "Dostoévsky" and "dostoevsky" compare equal.
+
+    Cached, so repeated values such as languages and authors are normalized once
+    and share a single folded string.
+
+    Args:
+        text (str): The string to normalize.
+
+    Returns:
+        str: The casefolded string without combining marks.
+    """
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def ngrams(text: str, n: int = 3) -> set[str]:
+    """
+    Splits a string into its distinct overlapping n-grams.
+
+    Args:
+        text (str): The string to split.
+        n (int, optional): Gram length. Defaults to 3.
+
+    Returns:
+        set[str]: The n-grams, empty if the string is shorter than n.
+    """
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+def padded_ngrams(text: str, n: int = 3) -> set[str]:
+    """
+    Splits each word of a string into n-grams, padded as pg_trgm does.
+
+    Every word gets n - 1 spaces in front and one behind, so even a short word
+    yields grams of its first letters and of its end ("joyce" gives "  j",
+    " jo", ..., "ce "), which a typo in the middle of the word leaves intact.
+
+    Args:
+        text (str): The string to split.
+        n (int, optional): Gram length. Defaults to 3.
+
+    Returns:
+        set[str]: The n-grams of all the words.
+    """
+    grams = set()
+    for word in text.split():
+        grams |= ngrams(" " * (n - 1) + word + " ", n)
+    return grams
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """
+    Checks whether two strings differ by at most one inserted, deleted or
+    substituted character, or one swap of adjacent characters.
+
+    Args:
+        a (str): The first string.
+        b (str): The second string.
+
+    Returns:
+        bool: True if the strings are at most one edit apart.
+    """
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) > len(b):
+        return a[i + 1 :] == b[i:]
+    if len(a) < len(b):
+        return a[i:] == b[i + 1 :]
+    return a[i + 1 :] == b[i + 1 :] or (
+        a[i : i + 2] == b[i : i + 2][::-1] and a[i + 2 :] == b[i + 2 :]
+    )
+
+
+def typo_match(query: str, text: str) -> bool:
+    """
+    Checks whether a text contains the query with at most one typo, comparing
+    the query with every run of as many whole words of the text.
+
+    Args:
+        query (str): The normalized query.
+        text (str): The normalized text.
+
+    Returns:
+        bool: True if some run of words is within one edit of the query.
+    """
+    if len(query) < TYPO_MIN_LENGTH:
+        return False
+    span = len(query.split())
+    words = text.split()
+    return any(
+        within_one_edit(query, " ".join(words[i : i + span]))
+        for i in range(len(words) - span + 1)
+    )
+
+
+def fuzzy_score(query: str, text: str, n: int = 3) -> float:
+    """
+    Scores a text for typo-tolerant search.
+
+    The score is the n-gram similarity, raised to 1 - 1/len(query) when some
+    words of the text are a single typo away from the query. Short names lose
+    most of their grams to one typo ("kafca" keeps one of "kafka"'s three),
+    which the edit distance still recognizes.
+
+    Args:
+        query (str): The normalized query.
+        text (str): The normalized text to score.
+        n (int, optional): Gram length. Defaults to 3.
+
+    Returns:
+        float: Score between 0.0 and 1.0.
+    """
+    score = similarity(query, text, n)
+    if score < 1.0 and typo_match(query, text):
+        score = max(score, 1 - 1 / len(query))
+    return score
+
+
+def similarity(query: str, text: str, n: int = 3) -> float:
+    """
+    Scores how closely a text matches a query, tolerating typos.
+
+    The score is the share of the query's n-grams that also occur in the text,
+    so a one-letter typo only costs the few grams around it and a query that is
+    a substring of the text scores 1.0.
+
+    Args:
+        query (str): The normalized query.
+        text (str): The normalized text to score.
+        n (int, optional): Gram length. Defaults to 3.
+
+    Returns:
+        float: Similarity between 0.0 and 1.0.
+    """
+    grams = ngrams(query, n)
+    if not grams:
+        return 1.0 if query in text else 0.0
+    return len(grams & ngrams(text, n)) / len(grams)
+
+
+class NgramIndex:
+    """
+    Inverted index from n-grams to the distinct values of a field.
+
+    Values are normalized once when a book is added and kept in self.texts, so
+    searches match case- and accent-insensitively without re-normalizing books.
+    Grams point at distinct values rather than books, so a value shared by many
+    books (an author, a language) is indexed once. Any value containing a query
+    as a substring contains every n-gram of the query, so intersecting the
+    posting lists leaves a few values to check before collecting their books.
+    Values are also posted under their padded word grams (see padded_ngrams()),
+    which typo-tolerant search uses to find short words with a typo.
+    """
+
+    def __init__(self, n: int = 3):
+        self.n = n
+        self.postings: dict[str, set[str]] = {}
+        self.books_by_text: dict[str, set] = {}
+        self.texts: dict[object, str] = {}
+
+    def grams(self, folded: str) -> set[str]:
+        """Returns the grams a normalized value is posted under."""
+        return ngrams(folded, self.n) | padded_ngrams(folded, self.n)
+
+    def add(self, book, text: str) -> None:
+        """
+        Indexes a book under the normalized form of a text.
+
+        Args:
+            book (Book): The book to index.
+            text (str): The field value to index it by.
+        """
+        folded = normalize_text(text)
+        self.texts[book] = folded
+        books = self.books_by_text.get(folded)
+        if books is None:
+            books = self.books_by_text[folded] = set()
+            for gram in self.grams(folded):
+                self.postings.setdefault(gram, set()).add(folded)
+        books.add(book)
+
+    def remove(self, book) -> None:
+        """
+        Drops a book from the index.
+
+        Args:
+            book (Book): The book to remove.
+        """
+        folded = self.texts.pop(book, None)
+        if folded is None:
+            return
+        books = self.books_by_text[folded]
+        books.discard(book)
+        if books:
+            return
+        del self.books_by_text[folded]
+        for gram in self.grams(folded):
+            posting = self.postings[gram]
+            posting.discard(folded)
+            if not posting:
+                del self.postings[gram]
+
+    def matching_texts(self, query: str) -> Optional[list[str]]:
+        """
+        Returns the distinct indexed values containing a query.
+
+        Args:
+            query (str): The substring being searched for, already normalized.
+
+        Returns:
+            Optional[list[str]]: The matching values, or None if the query is too
+            short to use the index.
+        """
+        grams = ngrams(query, self.n)
+        if not grams:
+            return None
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        texts = set(postings[0])
+        for posting in postings[1:]:
+            if not texts:
+                break
+            texts &= posting
+        return [text for text in texts if query in text]
+
+    def similar(self, query: str, threshold: float) -> Optional[list[str]]:
+        """
+        Returns the distinct indexed values resembling a query, best match first.
+
+        Only the posting lists of the query's n-grams are visited. Values
+        sharing enough plain grams with the query (see similarity()), or enough
+        padded word grams to be a typo away from it, are scored with
+        fuzzy_score(). Ties are broken in favour of values closest in length to
+        the query.
+
+        Args:
+            query (str): The normalized query.
+            threshold (float): Minimum similarity, between 0.0 and 1.0.
+
+        Returns:
+            Optional[list[str]]: The matching values, or None if the query is too
+            short to use the index.
+        """
+        grams = ngrams(query, self.n)
+        if not grams:
+            return None
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        needed = threshold * len(grams)
+        candidates = {text for text, count in shared.items() if count >= needed}
+        # One typo costs a query at most three of its own grams, so only a
+        # short query can fall below the threshold through a single typo.
+        if len(query) >= TYPO_MIN_LENGTH and len(grams) - 3 < needed:
+            # One edit changes at most four padded grams (a swap of two letters).
+            padded = padded_ngrams(query, self.n)
+            shared = Counter()
+            for gram in padded:
+                shared.update(self.postings.get(gram, ()))
+            needed = max(1, len(padded) - 4)
+            candidates.update(text for text, count in shared.items() if count >= needed)
+        scores = {text: fuzzy_score(query, text, self.n) for text in candidates}
+        matches = [text for text, score in scores.items() if score >= threshold]
+        matches.sort(key=lambda text: (-scores[text], abs(len(text) - len(query))))
+        return matches
+
+    def candidates(self, query: str) -> Optional[set]:
+        """
+        Returns the books whose value contains a query as a substring.
+
+        Args:
+            query (str): The substring being searched for, already normalized.
+
+        Returns:
+            Optional[set]: Matching books, or None if the query is too short to
+            narrow the search and every book has to be checked.
+        """
+        texts = self.matching_texts(query)
+        if texts is None:
+            return None
+        books = set()
+        for text in texts:
+            books |= self.books_by_text.get(text, ())
+        return books
+
+
+class PrefixIndex:
+    """
+    Sorted array of the distinct normalized values of a field, for autocomplete.
+
+    Every value starting with a prefix sits in one contiguous run of the array,
+    found with bisect. Each value keeps the first original spelling seen for it,
+    for display, and a count of the books holding it, so it is dropped from the
+    array when the last of them goes.
+    """
+
+    def __init__(self):
+        self.keys: list[str] = []
+        self.display: dict[str, str] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, text: str, sort: bool = True) -> None:
+        """
+        Counts one more book holding a value.
+
+        Args:
+            text (str): The field value.
+            sort (bool, optional): Insert new values into the array right away.
+                Pass False while bulk loading and call build() afterwards.
+                Defaults to True.
+        """
+        folded = normalize_text(text)
+        if folded in self.counts:
+            self.counts[folded] += 1
+            return
+        self.counts[folded] = 1
+        self.display[folded] = text
+        if sort:
+            insort(self.keys, folded)
+
+    def build(self) -> None:
+        """Sorts every counted value into the array in one go."""
+        self.keys = sorted(self.counts)
+
+    def remove(self, text: str) -> None:
+        """
+        Counts one book fewer holding a value.
+
+        Args:
+            text (str): The field value.
+        """
+        folded = normalize_text(text)
+        count = self.counts.get(folded)
+        if count is None:
+            return
+        if count > 1:
+            self.counts[folded] = count - 1
+            return
+        del self.counts[folded]
+        del self.display[folded]
+        position = bisect_left(self.keys, folded)
+        if position < len(self.keys) and self.keys[position] == folded:
+            del self.keys[position]
+
+    def complete(self, prefix: str, k: int) -> list[str]:
+        """
+        Returns up to k values starting with a prefix, in alphabetical order.
+
+        Args:
+            prefix (str): The prefix, matched ignoring case and accents.
+            k (int): Maximum number of completions.
+
+        Returns:
+            list[str]: The completions, spelt as first seen.
+        """
+        prefix = normalize_text(prefix)
+        position = bisect_left(self.keys, prefix)
+        completions = []
+        for folded in self.keys[position : position + k]:
+            if not folded.startswith(prefix):
+                break
+            completions.append(self.display[folded])
+        return completions
+
+
+class InsertionOrder:
+    """
+    Books in insertion order, removable without shifting the others.
+
+    A removed book leaves a hole (None) in its slot, so readers walking the list
+    without the lock neither skip nor repeat books. Once holes make up half the
+    slots the list is rebuilt without them, as a new list that running readers
+    do not see, which keeps removal amortized O(1). Slots are found by
+    bisecting the parallel list of insertion sequence numbers.
+    """
+
+    def __init__(self):
+        self.slots: list = []
+        self.seqs: list[int] = []
+        self.holes = 0
+
+    def __len__(self) -> int:
+        return len(self.slots) - self.holes
+
+    def __iter__(self):
+        return (book for book in self.slots if book is not None)
+
+    def append(self, book, seq: int) -> None:
+        """
+        Adds a book after every other one.
+
+        Args:
+            book (Book): The book to add.
+            seq (int): Its insertion sequence, higher than any added before.
+        """
+        self.slots.append(book)
+        self.seqs.append(seq)
+
+    def remove(self, seq: int) -> None:
+        """
+        Drops the book added with a sequence number.
+
+        Args:
+            seq (int): The book's insertion sequence.
+        """
+        position = bisect_left(self.seqs, seq)
+        if position == len(self.seqs) or self.seqs[position] != seq:
+            return
+        if self.slots[position] is None:
+            return
+        self.slots[position] = None
+        self.holes += 1
+        if self.holes * 2 > len(self.slots):
+            live = [
+                (book, seq)
+                for book, seq in zip(self.slots, self.seqs)
+                if book is not None
+            ]
+            self.slots = [book for book, _ in live]
+            self.seqs = [seq for _, seq in live]
+            self.holes = 0
+
+    def after(self, seq: Optional[int], limit: int) -> tuple[list, bool]:
+        """
+        Returns the books added after a sequence number.
+
+        Args:
+            seq (Optional[int]): Sequence number to start after, or None to start
+                from the first book.
+            limit (int): Maximum number of books to return.
+
+        Returns:
+            tuple[list, bool]: Up to limit books, and whether more follow.
+        """
+        start = 0 if seq is None else bisect_right(self.seqs, seq)
+        slots = self.slots
+        books = []
+        for position in range(start, len(slots)):
+            book = slots[position]
+            if book is None:
+                continue
+            if len(books) == limit:
+                return books, True
+            books.append(book)
+        return books, False
+
+
+class SortedIndex:
+    """
+    Books ordered by a numeric attribute, for range queries with bisect.
+
+    Entries are (value, seq) keys kept in a sorted list with the books in a
+    parallel list; the insertion sequence breaks ties so every key is unique.
+    """
+
+    def __init__(self):
+        self.keys: list[tuple] = []
+        self.books: list = []
+        self.key_of: dict[object, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, book, value, seq: int) -> None:
+        """
+        Indexes a book under a value. Non-numeric values are not indexed.
+
+        Args:
+            book (Book): The book to index.
+            value: The attribute value to order it by.
+            seq (int): The book's insertion sequence, used to break ties.
+        """
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        key = (value, seq)
+        position = bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.books.insert(position, book)
+        self.key_of[book] = key
+
+    def build(self, entries) -> None:
+        """
+        Replaces the index contents in one sort, for bulk loading.
+
+        Args:
+            entries (Iterable[tuple]): (book, value, seq) triples; non-numeric values are skipped.
+        """
+        pairs = sorted(
+            ((value, seq), book)
+            for book, value, seq in entries
+            if not isinstance(value, bool) and isinstance(value, (int, float))
+        )
+        self.keys = [key for key, _ in pairs]
+        self.books = [book for _, book in pairs]
+        self.key_of = {book: key for key, book in pairs}
+
+    def remove(self, book) -> None:
+        """
+        Drops a book from the index.
+
+        Args:
+            book (Book): The book to remove.
+        """
+        key = self.key_of.pop(book, None)
+        if key is None:
+            return
+        position = bisect_left(self.keys, key)
+        del self.keys[position]
+        del self.books[position]
+
+    def largest(self, k: int) -> list:
+        """
+        Returns the k books with the highest values, read from the end of the index.
+
+        Books sharing a value keep insertion order, as with heapq.nlargest, so
+        the cost is O(k) plus one bisect per distinct value returned.
+
+        Args:
+            k (int): Number of books to return.
+
+        Returns:
+            list: Up to k books, highest value first.
+        """
+        found = []
+        stop = len(self.keys)
+        while stop and len(found) < k:
+            start = bisect_left(self.keys, (self.keys[stop - 1][0],))
+            found.extend(self.books[start : min(stop, start + k - len(found))])
+            stop = start
+        return found
+
+    def span(self, low=None, high=None) -> tuple[int, int]:
+        """
+        Finds the positions of the books whose value lies within inclusive bounds.
+
+        Args:
+            low (optional): Lower bound, or None for no bound.
+            high (optional): Upper bound, or None for no bound.
+
+        Returns:
+            tuple[int, int]: Start and stop positions into self.books.
+        """
+        start = 0 if low is None else bisect_left(self.keys, (low,))
+        stop = (
+            len(self.keys)
+            if high is None
+            else bisect_right(self.keys, (high, float("inf")))
+        )
+        return start, max(start, stop)
+
+
+class EqualityIndex:
+    """
+    Books grouped by the exact value of a low-cardinality attribute.
+
+    Each posting set works like a bitmap for equality predicates, and its size
+    doubles as a maintained count of books per value.
+    """
+
+    def __init__(self):
+        self.postings: dict[object, set] = {}
+        self.value_of: dict[object, object] = {}
+
+    def add(self, book, value) -> None:
+        """
+        Indexes a book under a value.
+
+        Args:
+            book (Book): The book to index.
+            value: The attribute value to group it by.
+        """
+        self.value_of[book] = value
+        self.postings.setdefault(value, set()).add(book)
+
+    def remove(self, book) -> None:
+        """
+        Drops a book from the index.
+
+        Args:
+            book (Book): The book to remove.
+        """
+        if book not in self.value_of:
+            return
+        value = self.value_of.pop(book)
+        posting = self.postings[value]
+        posting.discard(book)
+        if not posting:
+            del self.postings[value]
+
+    def get(self, value) -> set:
+        """
+        Returns the books holding exactly a value.
+
+        Args:
+            value: The attribute value to look up.
+
+        Returns:
+            set: The matching books (do not modify).
+        """
+        return self.postings.get(value, set())
@@ -1,10 +1,137 @@
+import fcntl
+import heapq
 import json
+import os
+import pickle
+import secrets
+import sys
+import threading
+import weakref
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import count
 from uuid import uuid4
-from typing import Optional
+from typing import Iterable, Optional, Sequence
+
+from app.model import query
+from app.model.indexes import (
+    InsertionOrder,
+    EqualityIndex,
+    NgramIndex,
+    PrefixIndex,
+    SortedIndex,
+    normalize_text,
+)
+
+# Positional order of Book.__init__ arguments, used by binary snapshots.
+BOOK_FIELDS = (
+    "author",
+    "country",
+    "imageLink",
+    "language",
+    "link",
+    "pages",
+    "title",
+    "year",
+    "last_read_page",
+    "percentage_read",
+    "last_read_date",
+    "uuid",
+)
+
+SNAPSHOT_VERSION = 1
+
+# Text attributes searched case- and accent-insensitively by substring, each
+# backed by a trigram index holding its normalized values.
+TEXT_INDEX_FIELDS = ("title", "author", "language", "country")
+
+# Numeric attributes kept in sorted order for range queries.
+RANGE_INDEX_FIELDS = ("year", "pages", "last_read_date", "percentage_read")
+
+# Low-cardinality attributes grouped by exact value.
+EQUALITY_INDEX_FIELDS = ("language", "country")
+
+# Text attributes open to typo-tolerant search, and the minimum share of a
+# query's trigrams a value must contain to count as a match.
+FUZZY_FIELDS = ("title", "author")
+FUZZY_THRESHOLD = 0.6
+
+# Text attributes offered as search-as-you-type completions.
+SUGGEST_FIELDS = ("title", "author")
+
+# Attributes the library keeps per-value book counts for; "decade" is derived
+# from the year.
+FACET_FIELDS = ("language", "country", "decade")
+
+# Process-wide source of generation numbers, so a generation never repeats
+# across Library instances (e.g. after a reload from disk).
+_generations = count(1)
+
+# Names this process. Forked workers inherit libraries loaded before the fork
+# and then change their copies independently, so each child draws a new one.
+_process_id = secrets.token_hex(4)
+
+
+def _renew_process_id() -> None:
+    global _process_id
+    _process_id = secrets.token_hex(4)
+
+
+os.register_at_fork(after_in_child=_renew_process_id)
+
+
+def facet_value(book, field: str):
+    """
+    Returns the value a book is counted under for a facet.
+
+    Args:
+        book (Book): The book.
+        field (str): One of FACET_FIELDS.
+
+    Returns:
+        The attribute value, the decade of the year (e.g. 1860 for 1867), or
+        None if the book has no such value.
+    """
+    if field == "decade":
+        year = book.year
+        if isinstance(year, bool) or not isinstance(year, int):
+            return None
+        return year // 10 * 10
+    return getattr(book, field, None)
+
+
+def file_stamp(path: str) -> Optional[tuple[int, int]]:
+    """
+    Returns a cheap fingerprint of a file used to detect changes on disk.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        Optional[tuple[int, int]]: (mtime in nanoseconds, size) or None if the file is missing.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def intern_value(value):
+    """
+    Returns the canonical copy of a string, or the value unchanged.
+
+    Used for low-cardinality fields (author, country, language), so books share
+    one copy of each distinct value instead of holding their own.
+    """
+    return sys.intern(value) if type(value) is str else value
 
 
 class Book:
+    # No per-instance __dict__: a library can hold millions of books.
+    __slots__ = BOOK_FIELDS
+
     def __init__(
         self,
         author: str,
@@ -37,10 +164,10 @@ class Book:
             last_read_date (float): Timestamp of the last time user read the book.
             uuid (Optional[str]): Unique identifier for the book. Defaults to None if not provided.
         """
-        self.author = author
-        self.country = country
+        self.author = intern_value(author)
+        self.country = intern_value(country)
         self.imageLink = imageLink
-        self.language = language
+        self.language = intern_value(language)
         self.link = link
         self.pages = pages
         self.title = title
@@ -67,10 +194,26 @@ class Book:
         except (json.JSONDecodeError, KeyError) as e:
             raise ValueError(f"Invalid JSON data for creating a Book instance: {e}")
 
+    def to_row(self) -> tuple:
+        """Returns the book's attributes in BOOK_FIELDS order."""
+        return tuple(getattr(self, field) for field in BOOK_FIELDS)
+
     def to_json(self) -> str:
         return json.dumps(self.to_dict())
 
-    def to_dict(self) -> dict:
+    def to_dict(self, fields: Sequence[str] = None) -> dict:
+        """
+        Returns the book as a dictionary.
+
+        Args:
+            fields (Sequence[str], optional): Attributes to include, in order.
+                Defaults to None (every attribute).
+
+        Returns:
+            dict: The requested attributes by name.
+        """
+        if fields is not None:
+            return {field: getattr(self, field) for field in fields}
         return {
             "author": self.author,
             "country": self.country,
@@ -101,15 +244,270 @@ class Library:
     Represents a library of books with functionality to manage the collection.
     """
 
-    def __init__(self, data_file: str):
-        self.data_file = data_file
-        self.books = self.load_library()
+    def __init__(
+        self,
+        data_file: str,
+        journal: bool = False,
+        checkpoint_every: int = 1000,
+        writer=None,
+        snapshot: bool = False,
+    ):
         """
         Initializes the Library instance with the given data file.
 
         Args:
             data_file (str): Path to the JSON data file containing the library data.
+            journal (bool, optional): Append each mutation to a journal next to the
+                data file instead of rewriting the whole file. Defaults to False.
+            checkpoint_every (int, optional): Number of journal records after which
+                the data file is rewritten and the journal emptied. Defaults to 1000.
+            writer (GroupCommitWriter, optional): Background writer that batches
+                saves. Defaults to None, which saves synchronously on every mutation.
+            snapshot (bool, optional): Keep a pickled copy of the data file and load
+                from it while it is fresh. Defaults to False.
+        """
+        self.data_file = data_file
+        self.journal_file = f"{data_file}.journal"
+        self.lock_file = f"{data_file}.lock"
+        self.snapshot_file = f"{data_file}.snapshot"
+        self.snapshot = snapshot
+        self.journal = journal
+        self.checkpoint_every = checkpoint_every
+        self.journal_records = 0
+        self.writer = writer
+        self.dirty = False
+        self.pending_records: list[dict] = []
+        self.flush_ticket = 0
+        self.lock = threading.RLock()
+        # Serializes writes to disk. It is taken before self.lock, which a flush
+        # only holds while copying the pending changes, so readers are not kept
+        # waiting while the library is serialized and written.
+        self.flush_lock = threading.RLock()
+        # Exclusive flock on self.lock_file, held from the first mutation until it
+        # is written, so processes sharing the files take turns (see writing()).
+        self.file_lock = None
+        self.file_lock_pid = None
+        self.file_locked = False
+        self.stamp = self.disk_stamp()
+        self.books = InsertionOrder()
+        self.by_uuid: dict[str, Book] = {}
+        self.sequence = count()
+        self.load_token = secrets.token_hex(4)
+        self.seq_of: dict[Book, int] = {}
+        self.text_indexes = {field: NgramIndex() for field in TEXT_INDEX_FIELDS}
+        self.sorted_indexes = {field: SortedIndex() for field in RANGE_INDEX_FIELDS}
+        self.equality_indexes = {
+            field: EqualityIndex() for field in EQUALITY_INDEX_FIELDS
+        }
+        self.prefix_indexes = {field: PrefixIndex() for field in SUGGEST_FIELDS}
+        self.facet_counts = {field: Counter() for field in FACET_FIELDS}
+        for book in self.load_library():
+            self._insert(book, sort=False)
+        for field, index in self.sorted_indexes.items():
+            index.build(
+                (book, getattr(book, field), seq) for book, seq in self.seq_of.items()
+            )
+        for index in self.prefix_indexes.values():
+            index.build()
+        if journal:
+            self.journal_records = self.replay_journal()
+        self.generation = next(_generations)
+
+    def __len__(self) -> int:
+        return len(self.books)
+
+    @property
+    def load_id(self) -> str:
+        """
+        Names this load of the library in this process.
+
+        Sequence and generation numbers restart with every load and diverge
+        between processes, so they only mean something together with it.
+        """
+        return f"{_process_id}-{self.load_token}"
+
+    @contextmanager
+    def writing(self):
         """
+        Holds self.lock and the cross-process write lock around a mutation.
+
+        Worker processes each keep a copy of the library and rewrite the same
+        files, so a write based on a stale copy would drop what another process
+        wrote. On entry, the write lock is taken and the library is reloaded if
+        the files changed since it last read or wrote them. The lock is then held
+        until the mutation is written (see flush()), or released on exit if
+        nothing was changed. Check-then-act code must run entirely inside.
+        """
+        with self.lock:
+            if not self.file_locked:
+                if self.file_lock is None or self.file_lock_pid != os.getpid():
+                    # A lock file opened before a fork is shared with the parent.
+                    self.file_lock = os.open(self.lock_file, os.O_WRONLY | os.O_CREAT)
+                    self.file_lock_pid = os.getpid()
+                    weakref.finalize(self, os.close, self.file_lock)
+                fcntl.flock(self.file_lock, fcntl.LOCK_EX)
+                self.file_locked = True
+                if self.stamp != self.disk_stamp():
+                    self.reload()
+            try:
+                yield
+            finally:
+                if not self.dirty:
+                    self._release_file_lock()
+
+    def _release_file_lock(self, force: bool = False) -> None:
+        """Lets other processes write once this one has no unwritten changes."""
+        with self.lock:
+            if self.file_locked and (force or not self.dirty):
+                fcntl.flock(self.file_lock, fcntl.LOCK_UN)
+                self.file_locked = False
+
+    def reload(self) -> None:
+        """
+        Replaces the books and indexes with the contents of the files on disk.
+
+        Called under the write lock when another process has changed the files.
+        Changes of this library that could not be written are dropped.
+        """
+        fresh = Library(
+            self.data_file,
+            journal=self.journal,
+            checkpoint_every=self.checkpoint_every,
+            snapshot=self.snapshot,
+        )
+        for name in (
+            "stamp",
+            "books",
+            "by_uuid",
+            "sequence",
+            "load_token",
+            "seq_of",
+            "text_indexes",
+            "sorted_indexes",
+            "equality_indexes",
+            "prefix_indexes",
+            "facet_counts",
+            "journal_records",
+        ):
+            setattr(self, name, getattr(fresh, name))
+        self.dirty = False
+        self.pending_records = []
+        self.bump_generation()
+
+    def bump_generation(self) -> None:
+        """Marks the in-memory state as changed."""
+        self.generation = next(_generations)
+
+    def _insert(self, book: Book, sort: bool = True) -> None:
+        """
+        Appends a book and adds it to every index.
+
+        Pass sort=False while bulk loading; the sorted and prefix indexes are then
+        built in one go with their build methods.
+        """
+        self.by_uuid[book.uuid] = book
+        seq = self.seq_of[book] = next(self.sequence)
+        self.books.append(book, seq)
+        for field, index in self.text_indexes.items():
+            value = getattr(book, field)
+            if value is not None:
+                index.add(book, str(value))
+        if sort:
+            for field, index in self.sorted_indexes.items():
+                index.add(book, getattr(book, field), seq)
+        for field, index in self.equality_indexes.items():
+            index.add(book, self.text_indexes[field].texts.get(book))
+        for field, index in self.prefix_indexes.items():
+            value = getattr(book, field)
+            if value is not None:
+                index.add(str(value), sort=sort)
+        for field, counts in self.facet_counts.items():
+            value = facet_value(book, field)
+            if value is not None:
+                counts[value] += 1
+
+    def _delete(self, book: Book) -> None:
+        """Removes a book from the list and from every index."""
+        self.books.remove(self.seq_of.pop(book))
+        if self.by_uuid.get(book.uuid) is book:
+            del self.by_uuid[book.uuid]
+        for index in self.text_indexes.values():
+            index.remove(book)
+        for index in self.sorted_indexes.values():
+            index.remove(book)
+        for index in self.equality_indexes.values():
+            index.remove(book)
+        for field, index in self.prefix_indexes.items():
+            value = getattr(book, field)
+            if value is not None:
+                index.remove(str(value))
+        for field, counts in self.facet_counts.items():
+            value = facet_value(book, field)
+            if value is not None:
+                counts[value] -= 1
+                if not counts[value]:
+                    del counts[value]
+
+    def _reindex(self, book: Book, fields: tuple) -> None:
+        """Moves a book within the sorted indexes after some of its fields changed."""
+        for field in fields:
+            index = self.sorted_indexes[field]
+            index.remove(book)
+            index.add(book, getattr(book, field), self.seq_of[book])
+
+    def get_book(self, uuid: str) -> Optional[Book]:
+        """
+        Looks up a book by its exact UUID.
+
+        Args:
+            uuid (str): Unique identifier of the book.
+
+        Returns:
+            Optional[Book]: The book, or None if it is not in the library.
+        """
+        return self.by_uuid.get(uuid)
+
+    def find_books_by_uuid(self, uuids: Iterable[str]) -> dict[str, dict]:
+        """
+        Looks up many books by their exact UUIDs in one pass over the UUID index.
+
+        Args:
+            uuids (Iterable[str]): Unique identifiers of the books.
+
+        Returns:
+            dict[str, dict]: The books found, keyed by UUID; unknown UUIDs are left out.
+        """
+        found = {}
+        for uuid in uuids:
+            book = self.by_uuid.get(uuid)
+            if book is not None:
+                found[uuid] = book.to_dict()
+        return found
+
+    def disk_stamp(self):
+        """
+        Fingerprints the files backing this library.
+
+        Returns:
+            The data file stamp, paired with the journal stamp in journal mode.
+        """
+        if self.journal:
+            return file_stamp(self.data_file), file_stamp(self.journal_file)
+        return file_stamp(self.data_file)
+
+    def is_stale(self) -> bool:
+        """
+        Checks whether the files on disk changed since this library last read or wrote them.
+
+        Returns:
+            bool: True if the library should be reloaded.
+        """
+        if not self.flush_lock.acquire(blocking=False):
+            return False  # Our own write is in progress.
+        try:
+            return self.stamp != self.disk_stamp()
+        finally:
+            self.flush_lock.release()
 
     def load_library(self) -> list[Book]:
         """
@@ -118,62 +516,359 @@ class Library:
         Returns:
             list[Book]: A list of Book instances loaded from the data file.
         """
+        if self.snapshot:
+            books = self.load_snapshot()
+            if books is not None:
+                return books
         try:
             with open(self.data_file, "r") as f:
                 data = json.load(f)
-            return [Book.from_json(book) for book in data]
+            books = [Book.from_json(book) for book in data]
         except (json.JSONDecodeError, FileNotFoundError):
             return []
+        if self.snapshot:
+            self.save_snapshot([book.to_row() for book in books])
+        return books
+
+    def load_snapshot(self) -> Optional[list[Book]]:
+        """
+        Loads books from the binary snapshot if it matches the current data file.
+
+        Returns:
+            Optional[list[Book]]: The books, or None if the snapshot is missing or stale.
+        """
+        try:
+            with open(self.snapshot_file, "rb") as f:
+                version, stamp, rows = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        if version != SNAPSHOT_VERSION or stamp != file_stamp(self.data_file):
+            return None
+        return [Book(*row) for row in rows]
+
+    def save_snapshot(self, rows: list[tuple]) -> None:
+        """
+        Writes a binary snapshot of the books, tied to the current data file.
+
+        Args:
+            rows (list[tuple]): The books as Book.to_row() tuples, matching the
+                data file contents.
+        """
+        temp_file = f"{self.snapshot_file}.tmp"
+        with open(temp_file, "wb") as f:
+            pickle.dump(
+                (SNAPSHOT_VERSION, file_stamp(self.data_file), rows),
+                f,
+                protocol=5,
+            )
+        os.replace(temp_file, self.snapshot_file)
+
+    def replay_journal(self) -> int:
+        """
+        Applies the journal records on top of the loaded data file.
+
+        Replay is idempotent, so records that already reached the data file
+        (e.g. after a crash during checkpoint) are harmless. A torn write at the
+        tail is cut off the file, so the next append starts on a fresh line.
+
+        Returns:
+            int: Number of records replayed.
+        """
+        try:
+            with open(self.journal_file, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+
+        replayed = 0
+        valid = 0  # Bytes up to the end of the last complete record.
+        for line in lines:
+            if not line.endswith(b"\n"):
+                break  # Torn write at the tail of the journal.
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            valid += len(line)
+            op = record["op"]
+            if op == "add" and record["book"]["uuid"] not in self.by_uuid:
+                self._insert(Book.from_json(record["book"]))
+            elif op == "remove" and record["uuid"] in self.by_uuid:
+                self._delete(self.by_uuid[record["uuid"]])
+            elif op == "read" and record["uuid"] in self.by_uuid:
+                book = self.by_uuid[record["uuid"]]
+                book.last_read_page = record["last_read_page"]
+                book.percentage_read = record["percentage_read"]
+                book.last_read_date = record["last_read_date"]
+                self._reindex(book, ("percentage_read", "last_read_date"))
+            replayed += 1
+        if valid < sum(len(line) for line in lines):
+            os.truncate(self.journal_file, valid)
+            self.stamp = self.disk_stamp()
+        return replayed
 
     def save_library(self) -> None:
         """
         Saves the current state of the library into the data file in JSON format.
+
+        The books are copied under self.lock; encoding and writing them happen
+        after it is released.
         """
-        with open(self.data_file, "w") as f:
-            json.dump([book.to_dict() for book in self.books], f, indent=4)
+        with self.lock:
+            data = [book.to_dict() for book in self.books]
+            rows = [book.to_row() for book in self.books] if self.snapshot else None
+        # Write to a temporary file and swap it in, so readers in other threads or
+        # processes never see a half-written library.
+        temp_file = f"{self.data_file}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(data, f, indent=4)
+        os.replace(temp_file, self.data_file)
+        self.stamp = self.disk_stamp()
+        if self.snapshot:
+            self.save_snapshot(rows)
 
-    def add_book(self, book: Book) -> None:
+    def checkpoint(self) -> None:
+        """
+        Rewrites the data file from memory and empties the journal.
+        """
+        with self.flush_lock:
+            self.save_library()
+            if self.journal:
+                open(self.journal_file, "w").close()
+                self.journal_records = 0
+                self.stamp = self.disk_stamp()
+
+    def commit(self, *records: dict) -> None:
+        """
+        Records mutations, to be written by sync() or the background writer.
+
+        Must be called inside writing().
+
+        Args:
+            *records (dict): Compact descriptions of the mutations, used in journal mode.
+        """
+        self.bump_generation()
+        if self.journal:
+            self.pending_records.extend(records)
+        self.dirty = True
+        if self.writer is not None:
+            self.flush_ticket = self.writer.submit(self)
+
+    def flush(self) -> None:
+        """
+        Writes pending changes: the buffered journal records, or the whole library.
+
+        If the write fails the changes stay pending, so the next flush retries
+        them, and the error is raised. The cross-process write lock is released
+        once nothing is left to write, or on failure if no background writer
+        will retry, so other processes are not blocked by a failing disk.
+        """
+        with self.flush_lock:
+            try:
+                self._write_pending()
+            except Exception:
+                writer = self.writer
+                self._release_file_lock(force=writer is None or writer.closed)
+                raise
+            self._release_file_lock()
+
+    def _write_pending(self) -> None:
+        """Writes pending changes for flush(), which must hold self.flush_lock."""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            records, self.pending_records = self.pending_records, []
+        if not self.journal:
+            try:
+                self.save_library()
+            except Exception:
+                self.dirty = True  # Written again by the next flush.
+                raise
+            return
+
+        size = (
+            os.path.getsize(self.journal_file)
+            if os.path.exists(self.journal_file)
+            else 0
+        )
+        try:
+            with open(self.journal_file, "a") as f:
+                f.writelines(
+                    json.dumps(record, separators=(",", ":")) + "\n"
+                    for record in records
+                )
+        except Exception:
+            # Cut off a partly written batch and keep it for the next flush.
+            if os.path.exists(self.journal_file):
+                os.truncate(self.journal_file, size)
+            with self.lock:
+                self.pending_records[:0] = records
+                self.dirty = True
+            raise
+        self.journal_records += len(records)
+        if self.journal_records >= self.checkpoint_every:
+            self.checkpoint()
+        else:
+            self.stamp = self.disk_stamp()
+
+    def sync(self, wait: bool = True) -> None:
+        """
+        Writes the mutations committed so far, or waits for the writer to.
+
+        Call it after releasing self.lock, so the lock is not held while the
+        library is written and other writers can join the same batch.
+
+        Args:
+            wait (bool, optional): Block until the background writer has written
+                the changes; without a writer they are always written here.
+                Defaults to True.
+
+        Raises:
+            FlushError: If the background writer failed to save the library.
+        """
+        writer = self.writer
+        if writer is None or writer.closed:
+            self.flush()
+        elif wait:
+            writer.wait(self.flush_ticket, self)
+
+    def add_book(self, book: Book, wait: bool = True) -> None:
         """
         Adds a book to the library based on its UUID and updates the library.
 
         Args:
             uuid (str): Unique identifier of the book to be added.
+            wait (bool, optional): Wait until the change is on disk. Defaults to True.
         """
-        self.books.append(book)
-        self.save_library()
+        with self.writing():
+            self._insert(book)
+            self.commit({"op": "add", "book": book.to_dict()})
+        self.sync(wait)
 
-    def remove_book(self, uuid: str) -> None:
+    def add_books(self, books: list[Book], wait: bool = True) -> None:
+        """
+        Adds several books to the library with a single write.
+
+        Args:
+            books (list[Book]): The books to be added.
+            wait (bool, optional): Wait until the change is on disk. Defaults to True.
+        """
+        if not books:
+            return
+        with self.writing():
+            for book in books:
+                self._insert(book)
+            self.commit(*({"op": "add", "book": book.to_dict()} for book in books))
+        self.sync(wait)
+
+    def remove_book(self, uuid: str, wait: bool = True) -> None:
         """
         Removes a book from the library based on its UUID and updates the library.
 
         Args:
             uuid (str): Unique identifier of the book to be added.
+            wait (bool, optional): Wait until the change is on disk. Defaults to True.
         """
-        self.books = [book for book in self.books if book.uuid != uuid]
-        self.save_library()
+        with self.writing():
+            book = self.by_uuid.get(uuid)
+            if book is None:
+                return
+            self._delete(book)
+            self.commit({"op": "remove", "uuid": uuid})
+        self.sync(wait)
 
-    def list_books(self) -> list[dict]:
+    def list_books(self, fields: Sequence[str] = None) -> list[dict]:
         """
              Lists all the books present in the library.
 
+        Args:
+            fields (Sequence[str], optional): Attributes to include. Defaults to None (all).
+
         Returns:
             list[dict]: A list of dictionaries with each dictionary representing a book.
         """
-        return [book.to_dict() for book in self.books]
+        return [book.to_dict(fields) for book in self.books]
 
-    def find_books(self, **kwargs) -> list[dict]:
+    def list_books_page(
+        self,
+        limit: int,
+        after_uuid: str = None,
+        after_seq: int = None,
+        fields: Sequence[str] = None,
+    ) -> tuple[list[dict], Optional[tuple[int, str]]]:
+        """
+        Lists one page of books in insertion order.
+
+        The page starts after the given book. If that book has been removed
+        since, its sequence number marks the position instead. Only the books on
+        the page are converted to dictionaries.
+
+        Args:
+            limit (int): Maximum number of books on the page.
+            after_uuid (str, optional): UUID of the last book of the previous page.
+            after_seq (int, optional): Sequence number of that book in this load
+                (see self.load_id), or None if unknown.
+            fields (Sequence[str], optional): Attributes to include. Defaults to None (all).
+
+        Returns:
+            tuple[list[dict], Optional[tuple[int, str]]]: The page, and the
+            sequence number and UUID of its last book if more books follow.
+
+        Raises:
+            KeyError: If the given book was removed and after_seq is None.
+        """
+        with self.lock:
+            book = self.by_uuid.get(after_uuid) if after_uuid is not None else None
+            if book is not None:
+                after_seq = self.seq_of[book]
+            elif after_uuid is not None and after_seq is None:
+                raise KeyError(after_uuid)
+            page, more = self.books.after(after_seq, limit)
+            last = None
+            if page and more:
+                last = (self.seq_of[page[-1]], page[-1].uuid)
+        return [book.to_dict(fields) for book in page], last
+
+    def find_books(self, *, fields: Sequence[str] = None, **kwargs) -> list[dict]:
         """
         Searches for books in the library based on provided criteria.
 
+        Text attributes (TEXT_INDEX_FIELDS) match ignoring case and accents.
+
         Args:
+            fields (Sequence[str], optional): Attributes to include in the results.
+                Defaults to None (all).
             **kwargs: Key-value pairs representing book attributes and their desired values.
 
         Returns:
             list[dict]: A list of dictionaries representing the books that match the criteria.
         """
 
+        folded = {
+            key: normalize_text(str(value))
+            for key, value in kwargs.items()
+            if key in self.text_indexes
+        }
+
+        if "uuid" in kwargs:
+            book = self.by_uuid.get(kwargs["uuid"])
+            candidates = [book] if book is not None else []
+        else:
+            candidates = self.books
+            narrowed = None
+            with self.lock:  # A concurrent write would reshape the postings.
+                for key, value in folded.items():
+                    found = self.text_indexes[key].candidates(value)
+                    if found is not None and (
+                        narrowed is None or len(found) < len(narrowed)
+                    ):
+                        narrowed = found
+                if narrowed is not None:
+                    candidates = sorted(narrowed, key=self.seq_of.__getitem__)
+
         found_books = []
-        for book in self.books:
+        for book in candidates:
             matches = True
             for key, value in kwargs.items():
                 book_attr = getattr(book, key, None)
@@ -181,25 +876,205 @@ class Library:
                     if book_attr != value:
                         matches = False
                         break
+                elif key in folded:
+                    text = self.text_indexes[key].texts.get(book)
+                    if text is None or folded[key] not in text:
+                        matches = False
+                        break
                 else:
                     if book_attr is None or value not in str(book_attr):
                         matches = False
                         break
             if matches:
-                found_books.append(book.to_dict())
+                found_books.append(book.to_dict(fields))
         return found_books
 
-    def update_reading_status(self, uuid: str, last_read_page: int) -> None:
+    def fuzzy_find_books(
+        self,
+        key: str,
+        value: str,
+        threshold: float = FUZZY_THRESHOLD,
+        fields: Sequence[str] = None,
+    ) -> list[dict]:
+        """
+        Searches one text attribute tolerating typos, best match first.
+
+        Values are ranked by trigram similarity to the query, with words one
+        typo away from it also counted as close (see indexes.fuzzy_score); books
+        sharing a value keep insertion order. Queries shorter than a trigram
+        fall back to the substring search.
+
+        Args:
+            key (str): One of FUZZY_FIELDS.
+            value (str): The misspelt or partial value to look for.
+            threshold (float, optional): Minimum similarity. Defaults to FUZZY_THRESHOLD.
+            fields (Sequence[str], optional): Attributes to include. Defaults to None (all).
+
+        Returns:
+            list[dict]: The matching books as dictionaries.
+        """
+        index = self.text_indexes[key]
+        with self.lock:
+            texts = index.similar(normalize_text(str(value)), threshold)
+            if texts is None:
+                return self.find_books(fields=fields, **{key: value})
+            found = []
+            for text in texts:
+                found.extend(
+                    sorted(index.books_by_text[text], key=self.seq_of.__getitem__)
+                )
+        return [book.to_dict(fields) for book in found]
+
+    def top_books(self, key: str, k: int) -> list[dict]:
+        """
+        Finds the k books with the highest value of an attribute.
+
+        Indexed numeric attributes (RANGE_INDEX_FIELDS) are read from the end of
+        their sorted index; other attributes go through heapq.nlargest. Either
+        way, books sharing a value keep insertion order and books without the
+        attribute are skipped.
+
+        Args:
+            key (str): The attribute to rank by.
+            k (int): Number of books to return.
+
+        Returns:
+            list[dict]: Up to k books, highest value first.
+        """
+        with self.lock:
+            if key in self.sorted_indexes:
+                books = self.sorted_indexes[key].largest(k)
+            else:
+                books = heapq.nlargest(
+                    k,
+                    (
+                        book
+                        for book in self.books
+                        if getattr(book, key, None) is not None
+                    ),
+                    key=lambda book: getattr(book, key),
+                )
+        return [book.to_dict() for book in books]
+
+    def suggest(self, key: str, prefix: str, k: int) -> list[str]:
+        """
+        Completes a prefix from the distinct values of a text attribute.
+
+        Args:
+            key (str): One of SUGGEST_FIELDS.
+            prefix (str): What has been typed so far, matched ignoring case and accents.
+            k (int): Maximum number of completions.
+
+        Returns:
+            list[str]: Up to k values starting with the prefix, in alphabetical order.
+        """
+        with self.lock:
+            return self.prefix_indexes[key].complete(prefix, k)
+
+    def find_books_range(
+        self, key: str, low=None, high=None, offset: int = 0, limit: int = None
+    ) -> tuple[list[dict], int]:
+        """
+        Finds books whose numeric attribute lies within inclusive bounds.
+
+        Args:
+            key (str): One of RANGE_INDEX_FIELDS.
+            low (optional): Lower bound, or None for no bound.
+            high (optional): Upper bound, or None for no bound.
+            offset (int, optional): Number of matching books to skip. Defaults to 0.
+            limit (int, optional): Maximum number of books to return. Defaults to None.
+
+        Returns:
+            tuple[list[dict], int]: The requested page of books in ascending order of
+            the attribute, and the total number of matching books.
+        """
+        index = self.sorted_indexes[key]
+        with self.lock:
+            start, stop = index.span(low, high)
+            first = start + offset
+            last = stop if limit is None else min(stop, first + limit)
+            page = index.books[first:last]
+        return [book.to_dict() for book in page], stop - start
+
+    def query(self, predicates: list) -> tuple[list[dict], dict]:
+        """
+        Finds the books matching every predicate, using the most selective index.
+
+        Args:
+            predicates (list[Predicate]): Conditions parsed by query.parse_query.
+
+        Returns:
+            tuple[list[dict], dict]: The matching books and the chosen query plan.
+        """
+        books, plan = query.execute(self, predicates)
+        return [book.to_dict() for book in books], plan
+
+    def facets(
+        self, fields: Sequence[str], predicates: list = None
+    ) -> tuple[dict[str, list[dict]], int]:
+        """
+        Counts books per value of some attributes, most common value first.
+
+        Without predicates the counts maintained by _insert and _delete are
+        read directly. With predicates they are counted over the matching books.
+
+        Args:
+            fields (Sequence[str]): Facets to count, from FACET_FIELDS.
+            predicates (list[Predicate], optional): Conditions parsed by
+                query.parse_query that books must satisfy. Defaults to None.
+
+        Returns:
+            tuple[dict[str, list[dict]], int]: Value and count pairs per facet,
+            and the number of books counted.
+        """
+        if predicates is None:
+            with self.lock:
+                counts = {field: self.facet_counts[field].copy() for field in fields}
+                total = len(self.books)
+        else:
+            books, _ = query.execute(self, predicates)
+            counts = {
+                field: Counter(
+                    value
+                    for value in (facet_value(book, field) for book in books)
+                    if value is not None
+                )
+                for field in fields
+            }
+            total = len(books)
+        return {
+            field: [
+                {"value": value, "count": count}
+                for value, count in counts[field].most_common()
+            ]
+            for field in fields
+        }, total
+
+    def update_reading_status(
+        self, uuid: str, last_read_page: int, wait: bool = True
+    ) -> None:
         """
             Updates the reading status of a book in the library.
 
         Args:
             uuid (str): Unique identifier of the book.
             last_read_page (int): The latest page read by the user for that book.
+            wait (bool, optional): Wait until the change is on disk. Defaults to True.
         """
-        for book in self.books:
-            if book.uuid == uuid:
-                book.update_last_read_date()
-                book.update_last_read_page(int(last_read_page))
-                self.save_library()
-                break
+        with self.writing():
+            book = self.by_uuid.get(uuid)
+            if book is None:
+                return
+            book.update_last_read_date()
+            book.update_last_read_page(int(last_read_page))
+            self._reindex(book, ("percentage_read", "last_read_date"))
+            self.commit(
+                {
+                    "op": "read",
+                    "uuid": uuid,
+                    "last_read_page": book.last_read_page,
+                    "percentage_read": book.percentage_read,
+                    "last_read_date": book.last_read_date,
+                }
+            )
+        self.sync(wait)
@@ -0,0 +1,164 @@
+import os
+import threading
+
+from app.model import kindle_model
+from app.model.sqlite_model import SQLiteLibrary
+
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def open_library(data_file: str, **options):
+    """
+    Opens a library with the storage backend matching its file extension.
+
+    Args:
+        data_file (str): Path to a JSON data file or a SQLite database.
+        **options: Keyword arguments for kindle_model.Library (e.g. journal).
+
+    Returns:
+        Library | SQLiteLibrary: The opened library.
+    """
+    if data_file.endswith(SQLITE_EXTENSIONS):
+        return SQLiteLibrary(data_file)
+    return kindle_model.Library(data_file, **options)
+
+
+class LibraryCache:
+    """
+    Process-wide registry of loaded Library instances keyed by data file path.
+
+    A cached Library is reused for as long as its files on disk still match the
+    stamp recorded when it last loaded or saved them; otherwise it is reloaded.
+    Loading holds a lock of its own path only, so a slow load does not keep
+    other libraries from being served.
+    """
+
+    def __init__(self, **options):
+        """
+        Initializes an empty cache.
+
+        Args:
+            **options: Keyword arguments used when opening JSON libraries (e.g. journal).
+        """
+        self._lock = threading.Lock()
+        self._libraries: dict[str, kindle_model.Library] = {}
+        # One lock per path, so concurrent misses on a path load it only once.
+        self._loading: dict[str, threading.Lock] = {}
+        # Bumped by configure() and invalidate(), so a load that was running
+        # meanwhile is not cached.
+        self._epoch = 0
+        self.options = options
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, **options) -> None:
+        """
+        Changes the options used to open libraries and drops every cached library.
+
+        Args:
+            **options: Keyword arguments for kindle_model.Library (e.g. journal=True).
+        """
+        with self._lock:
+            self.options.update(options)
+            self._libraries.clear()
+            self._epoch += 1
+
+    def attach_writer(self, writer) -> None:
+        """
+        Hands saves of every library, cached or opened later, to a writer.
+
+        Unlike configure(writer=...), cached libraries are kept, so a worker
+        forked after the libraries were loaded does not have to reload them.
+
+        Args:
+            writer (GroupCommitWriter): The background writer.
+        """
+        with self._lock:
+            self.options["writer"] = writer
+            for library in self._libraries.values():
+                if hasattr(library, "writer"):
+                    library.writer = writer
+
+    def get(self, data_file: str) -> kindle_model.Library:
+        """
+        Returns the shared Library for a data file, loading it if needed.
+
+        Args:
+            data_file (str): Path to the JSON data file containing the library data.
+
+        Returns:
+            Library: The cached (or freshly loaded) Library instance.
+        """
+        key = os.path.abspath(data_file)
+        with self._lock:
+            library = self._libraries.get(key)
+            if library is not None and not library.is_stale():
+                self.hits += 1
+                return library
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                # Another thread may have loaded it while this one waited.
+                library = self._libraries.get(key)
+                if library is not None and not library.is_stale():
+                    self.hits += 1
+                    return library
+                self.misses += 1
+                options = dict(self.options)
+                epoch = self._epoch
+            library = open_library(key, **options)
+            with self._lock:
+                if hasattr(library, "writer") and "writer" in self.options:
+                    library.writer = self.options["writer"]  # Attached meanwhile.
+                if epoch == self._epoch:
+                    self._libraries[key] = library
+            return library
+
+    def invalidate(self, data_file: str = None) -> None:
+        """
+        Drops one cached Library, or all of them when no path is given.
+
+        Args:
+            data_file (str, optional): Path of the library to drop. Defaults to None.
+        """
+        with self._lock:
+            if data_file is None:
+                self._libraries.clear()
+            else:
+                self._libraries.pop(os.path.abspath(data_file), None)
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        """
+        Reports the cache counters.
+
+        Returns:
+            dict: Hits, misses and the generation of every cached library.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "libraries": {
+                    path: library.generation
+                    for path, library in self._libraries.items()
+                },
+            }
+
+
+library_cache = LibraryCache()
+
+
+def get_library(data_file: str) -> kindle_model.Library:
+    """
+    Returns the shared Library for a data file from the process-wide cache.
+
+    Args:
+        data_file (str): Path to the JSON data file containing the library data.
+
+    Returns:
+        Library: The cached Library instance.
+    """
+    return library_cache.get(data_file)
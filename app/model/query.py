@@ -0,0 +1,211 @@
+import re
+
+from app.model.indexes import normalize_text
+
+
+PREDICATE_PATTERN = re.compile(r"^\s*(\w+)\s*(~=|>=|<=|=|>|<)\s*(.*?)\s*$")
+
+NUMERIC_FIELDS = (
+    "pages",
+    "year",
+    "last_read_page",
+    "percentage_read",
+    "last_read_date",
+)
+
+COMPARISONS = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+}
+
+
+class Predicate:
+    """
+    One condition of a query, such as ``author~=Tolstoy`` or ``year>=1850``.
+
+    ``~=`` matches a substring, ``=`` an exact value and ``>=``, ``<=``, ``>``
+    and ``<`` compare numbers. Text comparisons against indexed fields ignore
+    case and accents.
+    """
+
+    def __init__(self, key: str, op: str, value: str):
+        """
+        Initializes a predicate, converting the value for numeric comparisons.
+
+        Args:
+            key (str): Book attribute to test.
+            op (str): One of ~=, =, >=, <=, > and <.
+            value (str): Value to compare with.
+
+        Raises:
+            ValueError: If a numeric comparison is given a non-numeric value.
+        """
+        self.key = key
+        self.op = op
+        self.text = value
+        self.value = value
+        self.folded = normalize_text(value)
+        if op in COMPARISONS or (op == "=" and key in NUMERIC_FIELDS):
+            try:
+                self.value = float(value)
+            except ValueError:
+                raise ValueError(f"{key}{op}{value}: {value!r} is not a number.")
+
+    def __str__(self) -> str:
+        return f"{self.key}{self.op}{self.text}"
+
+    def matches(self, book, texts: dict = None) -> bool:
+        """
+        Tests a book against the predicate.
+
+        Args:
+            book (Book): The book to test.
+            texts (dict, optional): Normalized values of the predicate's field by
+                book, from its NgramIndex. Defaults to None (exact comparison).
+
+        Returns:
+            bool: True if the book satisfies the predicate.
+        """
+        attr = getattr(book, self.key, None)
+        if attr is None:
+            return False
+        if self.op in ("~=", "=") and isinstance(self.value, str):
+            if texts is not None and book in texts:
+                text, value = texts[book], self.folded
+            else:
+                text, value = str(attr), self.value
+            return value in text if self.op == "~=" else text == value
+        if isinstance(attr, bool) or not isinstance(attr, (int, float)):
+            return False
+        if self.op == "=":
+            return attr == self.value
+        return COMPARISONS[self.op](attr, self.value)
+
+
+def parse_query(query: str) -> list[Predicate]:
+    """
+    Parses conditions joined by AND, e.g. ``author~=Tolstoy AND year>=1850``.
+
+    Args:
+        query (str): The query text.
+
+    Returns:
+        list[Predicate]: One predicate per condition.
+
+    Raises:
+        ValueError: If a condition cannot be parsed.
+    """
+    predicates = []
+    for condition in re.split(r"\s+AND\s+", query.strip()):
+        match = PREDICATE_PATTERN.match(condition)
+        if not match or not match.group(3):
+            raise ValueError(f"Invalid condition: {condition!r}.")
+        predicates.append(Predicate(*match.groups()))
+    return predicates
+
+
+def access_path(library, predicate: Predicate):
+    """
+    Describes how an index of the library could answer a predicate.
+
+    Args:
+        library (Library): The library to query.
+        predicate (Predicate): The predicate to answer.
+
+    Returns:
+        Optional[dict]: The index name, the number of candidate rows and a
+        callable fetching them, or None if no index applies.
+    """
+    key, op, value = predicate.key, predicate.op, predicate.value
+
+    if key == "uuid" and op == "=":
+        book = library.by_uuid.get(value)
+        rows = [book] if book is not None else []
+        return {"index": "uuid", "estimated_rows": len(rows), "fetch": lambda: rows}
+
+    if key in library.equality_indexes and op == "=":
+        posting = library.equality_indexes[key].get(predicate.folded)
+        return {
+            "index": "equality",
+            "estimated_rows": len(posting),
+            "fetch": lambda: list(posting),
+        }
+
+    if key in library.sorted_indexes and isinstance(value, float):
+        low = value if op in ("=", ">=", ">") else None
+        high = value if op in ("=", "<=", "<") else None
+        index = library.sorted_indexes[key]
+        start, stop = index.span(low, high)
+        return {
+            "index": "range",
+            "estimated_rows": stop - start,
+            "fetch": lambda: index.books[start:stop],
+        }
+
+    if key in library.text_indexes and op in ("~=", "="):
+        found = library.text_indexes[key].candidates(predicate.folded)
+        if found is not None:
+            return {
+                "index": "ngram",
+                "estimated_rows": len(found),
+                "fetch": lambda: list(found),
+            }
+
+    return None
+
+
+def execute(library, predicates: list[Predicate]) -> tuple[list, dict]:
+    """
+    Answers a conjunction of predicates from the most selective index.
+
+    The candidate rows of the cheapest access path (or a full scan) are checked
+    against every predicate; results keep the library's insertion order.
+
+    Args:
+        library (Library): The library to query.
+        predicates (list[Predicate]): Conditions that must all hold.
+
+    Returns:
+        tuple[list, dict]: The matching books and a description of the plan.
+    """
+    with library.lock:
+        options = []
+        for predicate in predicates:
+            option = access_path(library, predicate)
+            if option is not None:
+                option["predicate"] = str(predicate)
+                options.append(option)
+        scan = {
+            "index": "scan",
+            "predicate": None,
+            "estimated_rows": len(library.books),
+            "fetch": lambda: list(library.books),
+        }
+        best = min(options + [scan], key=lambda option: option["estimated_rows"])
+        candidates = best["fetch"]()
+        if best is not scan:
+            candidates.sort(key=library.seq_of.__getitem__)
+
+    texts = [
+        library.text_indexes[p.key].texts if p.key in library.text_indexes else None
+        for p in predicates
+    ]
+    matched = [
+        book
+        for book in candidates
+        if all(p.matches(book, t) for p, t in zip(predicates, texts))
+    ]
+    plan = {
+        "index": best["index"],
+        "predicate": best["predicate"],
+        "estimated_rows": best["estimated_rows"],
+        "rows_scanned": len(candidates),
+        "rows_matched": len(matched),
+        "considered": [
+            {key: option[key] for key in ("predicate", "index", "estimated_rows")}
+            for option in options + [scan]
+        ],
+    }
+    return matched, plan
@@ -0,0 +1,659 @@
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Iterable, Optional, Sequence
+
+from app.model.indexes import fuzzy_score, normalize_text
+from app.model.kindle_model import (
+    FUZZY_THRESHOLD,
+    RANGE_INDEX_FIELDS,
+    TEXT_INDEX_FIELDS,
+    Book,
+)
+
+
+COLUMNS = [
+    "author",
+    "country",
+    "imageLink",
+    "language",
+    "link",
+    "pages",
+    "title",
+    "year",
+    "uuid",
+    "last_read_page",
+    "percentage_read",
+    "last_read_date",
+]
+
+# Case- and accent-folded copies of the text columns (see normalize_text), which
+# text matches compare against, like the n-gram indexes of kindle_model.Library.
+FOLDED_COLUMNS = {field: f"{field}_folded" for field in TEXT_INDEX_FIELDS}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uuid TEXT NOT NULL UNIQUE,
+    author TEXT,
+    country TEXT,
+    imageLink TEXT,
+    language TEXT,
+    link TEXT,
+    pages INTEGER,
+    title TEXT,
+    year INTEGER,
+    last_read_page INTEGER,
+    percentage_read REAL,
+    last_read_date REAL
+);
+CREATE TABLE IF NOT EXISTS library_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO library_meta (key, value) VALUES ('generation', 0);
+"""
+
+# Created once the folded columns exist; see SQLiteLibrary._add_folded_columns.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS books_author ON books (author);
+CREATE INDEX IF NOT EXISTS books_title ON books (title);
+CREATE INDEX IF NOT EXISTS books_language ON books (language);
+CREATE INDEX IF NOT EXISTS books_year ON books (year);
+CREATE INDEX IF NOT EXISTS books_pages ON books (pages);
+CREATE INDEX IF NOT EXISTS books_last_read_date ON books (last_read_date);
+CREATE INDEX IF NOT EXISTS books_percentage_read ON books (percentage_read);
+CREATE INDEX IF NOT EXISTS books_author_folded ON books (author_folded);
+CREATE INDEX IF NOT EXISTS books_title_folded ON books (title_folded);
+CREATE INDEX IF NOT EXISTS books_language_folded ON books (language_folded);
+CREATE INDEX IF NOT EXISTS books_country_folded ON books (country_folded);
+"""
+
+SELECT_COLUMNS = ", ".join(COLUMNS)
+INSERT_COLUMNS = COLUMNS + list(FOLDED_COLUMNS.values())
+# A book already in the library keeps its row, position and reading progress.
+INSERT_BOOK = (
+    f"INSERT INTO books ({', '.join(INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in INSERT_COLUMNS)}) "
+    "ON CONFLICT(uuid) DO NOTHING"
+)
+BUMP_GENERATION = "UPDATE library_meta SET value = value + 1 WHERE key = 'generation'"
+
+# UUIDs bound per IN (...) lookup, below SQLite's default variable limit.
+UUID_BATCH_SIZE = 500
+
+
+def fold(value) -> Optional[str]:
+    """
+    Returns the folded form of a column value, as stored in FOLDED_COLUMNS.
+
+    Args:
+        value: The column value, or None.
+
+    Returns:
+        Optional[str]: The normalized text, or None for a missing value.
+    """
+    return None if value is None else normalize_text(str(value))
+
+
+class SQLiteLibrary:
+    """
+    A Library stored in a SQLite database instead of a JSON file.
+
+    Exposes the same public API as kindle_model.Library, but every mutation
+    touches only the affected row. The database runs in WAL mode and each
+    thread gets its own connection, so reads proceed while a write is in flight.
+    """
+
+    # Sequence numbers are stored with the rows, so they outlive any one load.
+    load_id = "sqlite"
+
+    def __init__(self, data_file: str):
+        """
+        Initializes the library, creating the schema if the database is new.
+
+        Args:
+            data_file (str): Path to the SQLite database file.
+        """
+        self.data_file = data_file
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            self._add_folded_columns(conn)
+            conn.executescript(INDEXES)
+
+    @staticmethod
+    def _add_folded_columns(conn: sqlite3.Connection) -> None:
+        """Adds and fills the folded columns missing from a database made before them."""
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(books)")}
+        for field, column in FOLDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE books ADD COLUMN {column} TEXT")
+                conn.execute(f"UPDATE books SET {column} = fold({field})")
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+    def is_stale(self) -> bool:
+        """
+        Reads go straight to the database, so a cached instance never needs reloading.
+
+        Returns:
+            bool: Always False.
+        """
+        return False
+
+    @property
+    def generation(self) -> int:
+        """Returns the change counter stored in the database."""
+        row = (
+            self._connection()
+            .execute("SELECT value FROM library_meta WHERE key = 'generation'")
+            .fetchone()
+        )
+        return row[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection, opening it on first use.
+
+        Returns:
+            sqlite3.Connection: A connection configured for WAL mode.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.data_file, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.create_function("fold", 1, fold, deterministic=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row, fields: Sequence[str] = None) -> dict:
+        return {column: row[column] for column in fields or COLUMNS}
+
+    @staticmethod
+    def _select_columns(fields: Sequence[str] = None) -> str:
+        """Column list of a SELECT returning the given fields, or every column."""
+        if fields is None:
+            return SELECT_COLUMNS
+        unknown = [field for field in fields if field not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}.")
+        return ", ".join(fields)
+
+    def writing(self) -> threading.RLock:
+        """
+        Returns the lock that check-then-act code holds around a mutation.
+
+        SQLite already serializes writers across processes, so the library's
+        own lock is all that is needed.
+        """
+        return self.lock
+
+    def sync(self, wait: bool = True) -> None:
+        """Every write commits synchronously, so there is nothing to wait for."""
+
+    def add_book(self, book: Book, wait: bool = True) -> None:
+        """
+        Adds a book to the library.
+
+        Args:
+            book (Book): The book to be added.
+            wait (bool, optional): Accepted for API parity; writes are always synchronous.
+        """
+        self.add_books([book])
+
+    def add_books(self, books: list[Book], wait: bool = True) -> None:
+        """
+        Adds several books to the library in a single transaction.
+
+        Books whose UUID is already in the library are skipped.
+
+        Args:
+            books (list[Book]): The books to be added.
+            wait (bool, optional): Accepted for API parity; writes are always synchronous.
+        """
+        rows = []
+        for book in books:
+            values = book.to_dict()
+            rows.append(
+                tuple(values[column] for column in COLUMNS)
+                + tuple(fold(values[field]) for field in FOLDED_COLUMNS)
+            )
+        with self._connection() as conn:
+            conn.executemany(INSERT_BOOK, rows)
+            conn.execute(BUMP_GENERATION)
+
+    def remove_book(self, uuid: str, wait: bool = True) -> None:
+        """
+        Removes a book from the library based on its UUID.
+
+        Args:
+            uuid (str): Unique identifier of the book to be removed.
+            wait (bool, optional): Accepted for API parity; writes are always synchronous.
+        """
+        with self._connection() as conn:
+            conn.execute("DELETE FROM books WHERE uuid = ?", (uuid,))
+            conn.execute(BUMP_GENERATION)
+
+    def list_books(self, fields: Sequence[str] = None) -> list[dict]:
+        """
+        Lists all the books present in the library.
+
+        Args:
+            fields (Sequence[str], optional): Columns to include. Defaults to None (all).
+
+        Returns:
+            list[dict]: A list of dictionaries with each dictionary representing a book.
+        """
+        rows = self._connection().execute(
+            f"SELECT {self._select_columns(fields)} FROM books ORDER BY seq"
+        )
+        return [self._row_to_dict(row, fields) for row in rows]
+
+    def list_books_page(
+        self,
+        limit: int,
+        after_uuid: str = None,
+        after_seq: int = None,
+        fields: Sequence[str] = None,
+    ) -> tuple[list[dict], Optional[tuple[int, str]]]:
+        """
+        Lists one page of books in insertion order.
+
+        Args:
+            limit (int): Maximum number of books on the page.
+            after_uuid (str, optional): UUID of the last book of the previous page.
+            after_seq (int, optional): Its sequence number, used if it was removed.
+            fields (Sequence[str], optional): Columns to include. Defaults to None (all).
+
+        Returns:
+            tuple[list[dict], Optional[tuple[int, str]]]: The page, and the
+            sequence number and UUID of its last book if more books follow.
+
+        Raises:
+            KeyError: If the given book was removed and after_seq is None.
+        """
+        connection = self._connection()
+        if after_uuid is not None:
+            row = connection.execute(
+                "SELECT seq FROM books WHERE uuid = ?", (after_uuid,)
+            ).fetchone()
+            if row is not None:
+                after_seq = row[0]
+            elif after_seq is None:
+                raise KeyError(after_uuid)
+        rows = connection.execute(
+            f"SELECT seq, {SELECT_COLUMNS} FROM books WHERE seq > ? ORDER BY seq LIMIT ?",
+            (after_seq if after_seq is not None else 0, limit + 1),
+        ).fetchall()
+        page = rows[:limit]
+        last = None
+        if len(rows) > limit and page:
+            last = (page[-1]["seq"], page[-1]["uuid"])
+        return [self._row_to_dict(row, fields) for row in page], last
+
+    def find_books(self, *, fields: Sequence[str] = None, **kwargs) -> list[dict]:
+        """
+        Searches for books in the library based on provided criteria.
+
+        UUIDs must match exactly; every other attribute matches on substring,
+        like kindle_model.Library.find_books. Text attributes (FOLDED_COLUMNS)
+        match ignoring case and accents.
+
+        Args:
+            fields (Sequence[str], optional): Columns to include in the results.
+                Defaults to None (all).
+            **kwargs: Key-value pairs representing book attributes and their desired values.
+
+        Returns:
+            list[dict]: A list of dictionaries representing the books that match the criteria.
+        """
+        clauses = []
+        params = []
+        for key, value in kwargs.items():
+            if key not in COLUMNS:
+                return []
+            if key == "uuid":
+                clauses.append("uuid = ?")
+                params.append(str(value))
+            elif key in FOLDED_COLUMNS:
+                clauses.append(f"instr({FOLDED_COLUMNS[key]}, ?) > 0")
+                params.append(fold(value))
+            else:
+                clauses.append(f"instr(CAST({key} AS TEXT), ?) > 0")
+                params.append(str(value))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = self._select_columns(fields)
+        rows = self._connection().execute(
+            f"SELECT {columns} FROM books {where} ORDER BY seq", params
+        )
+        return [self._row_to_dict(row, fields) for row in rows]
+
+    def find_books_by_uuid(self, uuids: Iterable[str]) -> dict[str, dict]:
+        """
+        Looks up many books by their exact UUIDs, a few hundred per query.
+
+        Args:
+            uuids (Iterable[str]): Unique identifiers of the books.
+
+        Returns:
+            dict[str, dict]: The books found, keyed by UUID; unknown UUIDs are left out.
+        """
+        uuids = list(dict.fromkeys(uuids))
+        conn = self._connection()
+        found = {}
+        for start in range(0, len(uuids), UUID_BATCH_SIZE):
+            batch = uuids[start : start + UUID_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT {SELECT_COLUMNS} FROM books WHERE uuid IN ({placeholders})",
+                batch,
+            )
+            for row in rows:
+                book = self._row_to_dict(row)
+                found[book["uuid"]] = book
+        return found
+
+    def fuzzy_find_books(
+        self,
+        key: str,
+        value: str,
+        threshold: float = FUZZY_THRESHOLD,
+        fields: Sequence[str] = None,
+    ) -> list[dict]:
+        """
+        Searches one text attribute tolerating typos, best match first.
+
+        SQLite has no trigram index here, so the distinct values of the column
+        are scored in Python, like kindle_model.Library.fuzzy_find_books.
+
+        Args:
+            key (str): One of kindle_model.FUZZY_FIELDS.
+            value (str): The misspelt or partial value to look for.
+            threshold (float, optional): Minimum similarity. Defaults to FUZZY_THRESHOLD.
+            fields (Sequence[str], optional): Columns to include. Defaults to None (all).
+
+        Returns:
+            list[dict]: The matching books as dictionaries.
+        """
+        if key not in COLUMNS:
+            return []
+        query = normalize_text(str(value))
+        columns = self._select_columns(fields)
+        connection = self._connection()
+        scored = []
+        for (text,) in connection.execute(f"SELECT DISTINCT {key} FROM books"):
+            if text is None:
+                continue
+            folded = normalize_text(str(text))
+            score = fuzzy_score(query, folded)
+            if score >= threshold:
+                scored.append((-score, abs(len(folded) - len(query)), text))
+        found = []
+        for _, _, text in sorted(scored):
+            rows = connection.execute(
+                f"SELECT {columns} FROM books WHERE {key} = ? ORDER BY seq",
+                (text,),
+            )
+            found.extend(self._row_to_dict(row, fields) for row in rows)
+        return found
+
+    def top_books(self, key: str, k: int) -> list[dict]:
+        """
+        Finds the k books with the highest value of an attribute.
+
+        Args:
+            key (str): The attribute to rank by.
+            k (int): Number of books to return.
+
+        Returns:
+            list[dict]: Up to k books, highest value first, ties in insertion order.
+        """
+        if key not in COLUMNS:
+            return []
+        rows = self._connection().execute(
+            f"SELECT {SELECT_COLUMNS} FROM books WHERE {key} IS NOT NULL "
+            f"ORDER BY {key} DESC, seq LIMIT ?",
+            (k,),
+        )
+        return [self._row_to_dict(row) for row in rows]
+
+    def suggest(self, key: str, prefix: str, k: int) -> list[str]:
+        """
+        Completes a prefix from the distinct values of a text attribute.
+
+        The prefix is matched against the folded column, so like
+        kindle_model.Library.suggest it ignores case and accents.
+
+        Args:
+            key (str): One of kindle_model.SUGGEST_FIELDS.
+            prefix (str): What has been typed so far.
+            k (int): Maximum number of completions.
+
+        Returns:
+            list[str]: Up to k values starting with the prefix, in alphabetical order.
+        """
+        if key not in FOLDED_COLUMNS:
+            return []
+        folded = FOLDED_COLUMNS[key]
+        pattern = (
+            fold(prefix).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            + "%"
+        )
+        # With MIN(seq), SQLite takes the bare column from the first book holding
+        # each folded value, so every completion keeps its first spelling.
+        rows = self._connection().execute(
+            f"SELECT {key}, MIN(seq) FROM books WHERE {folded} LIKE ? ESCAPE '\\' "
+            f"GROUP BY {folded} ORDER BY {folded} LIMIT ?",
+            (pattern, k),
+        )
+        return [value for value, _ in rows]
+
+    def find_books_range(
+        self, key: str, low=None, high=None, offset: int = 0, limit: int = None
+    ) -> tuple[list[dict], int]:
+        """
+        Finds books whose numeric attribute lies within inclusive bounds.
+
+        Args:
+            key (str): One of kindle_model.RANGE_INDEX_FIELDS.
+            low (optional): Lower bound, or None for no bound.
+            high (optional): Upper bound, or None for no bound.
+            offset (int, optional): Number of matching books to skip. Defaults to 0.
+            limit (int, optional): Maximum number of books to return. Defaults to None.
+
+        Returns:
+            tuple[list[dict], int]: The requested page of books in ascending order of
+            the attribute, and the total number of matching books.
+        """
+        if key not in RANGE_INDEX_FIELDS:
+            raise KeyError(key)
+        where = f"WHERE {key} >= ? AND {key} <= ?"
+        params = [
+            float("-inf") if low is None else low,
+            float("inf") if high is None else high,
+        ]
+        conn = self._connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM books {where}", params).fetchone()
+        rows = conn.execute(
+            f"SELECT {SELECT_COLUMNS} FROM books {where} ORDER BY {key}, seq "
+            "LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset],
+        )
+        return [self._row_to_dict(row) for row in rows], total[0]
+
+    @staticmethod
+    def _where(predicates: list) -> Optional[tuple[str, list]]:
+        """
+        Translates query predicates into a WHERE clause.
+
+        Args:
+            predicates (list[Predicate]): Conditions parsed by query.parse_query.
+
+        Returns:
+            Optional[tuple[str, list]]: The clause (empty without predicates) and
+            its parameters, or None if a predicate names an unknown column.
+        """
+        clauses = []
+        params = []
+        for predicate in predicates:
+            key, op, value = predicate.key, predicate.op, predicate.value
+            if key not in COLUMNS:
+                return None
+            if key in FOLDED_COLUMNS and isinstance(value, str):
+                column, value = FOLDED_COLUMNS[key], predicate.folded
+            else:
+                column = key
+            if op == "~=":
+                clauses.append(f"instr(CAST({column} AS TEXT), ?) > 0")
+            elif op == "=" and isinstance(value, str):
+                clauses.append(f"CAST({column} AS TEXT) = ?")
+            else:
+                clauses.append(f"{column} {op} ?")
+            params.append(value)
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def facets(
+        self, fields: Sequence[str], predicates: list = None
+    ) -> tuple[dict[str, list[dict]], int]:
+        """
+        Counts books per value of some attributes, most common value first.
+
+        Args:
+            fields (Sequence[str]): Facets to count, from kindle_model.FACET_FIELDS.
+            predicates (list[Predicate], optional): Conditions parsed by
+                query.parse_query that books must satisfy. Defaults to None.
+
+        Returns:
+            tuple[dict[str, list[dict]], int]: Value and count pairs per facet,
+            and the number of books counted.
+        """
+        condition = self._where(predicates or [])
+        if condition is None:
+            return {field: [] for field in fields}, 0
+        where, params = condition
+        conn = self._connection()
+        facets = {}
+        for field in fields:
+            if field == "decade":
+                # Floor to the decade for negative years too, like Python's //.
+                expr, not_null = "year - ((year % 10) + 10) % 10", "year"
+            elif field in COLUMNS:
+                expr, not_null = field, field
+            else:
+                facets[field] = []
+                continue
+            filters = f"{where} AND" if where else "WHERE"
+            rows = conn.execute(
+                f"SELECT {expr} AS value, COUNT(*) AS count FROM books "
+                f"{filters} {not_null} IS NOT NULL "
+                f"GROUP BY value ORDER BY count DESC, MIN(seq)",
+                params,
+            )
+            facets[field] = [{"value": row[0], "count": row[1]} for row in rows]
+        total = conn.execute(f"SELECT COUNT(*) FROM books {where}", params).fetchone()
+        return facets, total[0]
+
+    def query(self, predicates: list) -> tuple[list[dict], dict]:
+        """
+        Finds the books matching every predicate with a single SQL statement.
+
+        Args:
+            predicates (list[Predicate]): Conditions parsed by query.parse_query.
+
+        Returns:
+            tuple[list[dict], dict]: The matching books and SQLite's query plan.
+        """
+        condition = self._where(predicates)
+        if condition is None:
+            return [], {"index": "sqlite", "details": []}
+        where, params = condition
+
+        sql = f"SELECT {SELECT_COLUMNS} FROM books {where} ORDER BY seq"
+        conn = self._connection()
+        details = [
+            row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        ]
+        books = [self._row_to_dict(row) for row in conn.execute(sql, params)]
+        return books, {
+            "index": "sqlite",
+            "details": details,
+            "rows_matched": len(books),
+        }
+
+    def update_reading_status(
+        self, uuid: str, last_read_page: int, wait: bool = True
+    ) -> None:
+        """
+        Updates the reading status of a book in the library.
+
+        Args:
+            uuid (str): Unique identifier of the book.
+            last_read_page (int): The latest page read by the user for that book.
+            wait (bool, optional): Accepted for API parity; writes are always synchronous.
+        """
+        last_read_page = int(last_read_page)
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT pages FROM books WHERE uuid = ?", (uuid,)
+            ).fetchone()
+            if row is None:
+                return
+            pages = row["pages"]
+            percentage_read = (last_read_page / pages) * 100 if pages else 0
+            conn.execute(
+                "UPDATE books SET last_read_page = ?, percentage_read = ?, "
+                "last_read_date = ? WHERE uuid = ?",
+                (last_read_page, percentage_read, datetime.now().timestamp(), uuid),
+            )
+            conn.execute(BUMP_GENERATION)
+
+
+def import_json_library(json_file: str, db_file: str) -> int:
+    """
+    Copies every book of a JSON library file into a SQLite library.
+
+    Books whose UUID is already in the database are skipped, so their rows keep
+    their position and reading progress.
+
+    Args:
+        json_file (str): Path to the JSON data file.
+        db_file (str): Path to the SQLite database file to create or update.
+
+    Returns:
+        int: Number of books imported.
+    """
+    with open(json_file, "r") as f:
+        data = json.load(f)
+    books = [Book.from_json(book) for book in data]
+    SQLiteLibrary(db_file).add_books(books)
+    return len(books)
+
+
+DEFAULT_IMPORTS = [
+    ("data.json", "data.db"),
+    ("user_library/user_library.json", "user_library/user_library.db"),
+]
+
+
+if __name__ == "__main__":
+    # python -m app.model.sqlite_model [<library.json> <library.db>]
+    if len(sys.argv) == 3:
+        imports = [(sys.argv[1], sys.argv[2])]
+    elif len(sys.argv) == 1:
+        imports = DEFAULT_IMPORTS
+    else:
+        sys.exit(
+            "usage: python -m app.model.sqlite_model [<library.json> <library.db>]"
+        )
+    for json_file, db_file in imports:
+        imported = import_json_library(json_file, db_file)
+        print(f"Imported {imported} books from {json_file} into {db_file}")
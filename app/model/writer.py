@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Failed flushes remembered for callers still to wake up and check them.
+FAILURES_KEPT = 1024
+
+# Upper bound, in seconds, of the doubling delay before a failed library is
+# flushed again.
+MAX_RETRY_DELAY = 5.0
+
+
+class FlushError(Exception):
+    """Raised by GroupCommitWriter.wait() when the flush being waited for failed."""
+
+    pass
+
+
+class GroupCommitWriter:
+    """
+    Background thread that coalesces library saves.
+
+    Libraries submit themselves when they change; the writer flushes every dirty
+    library once per interval, or as soon as batch_size mutations are queued, so
+    a burst of updates costs one write per library instead of one per request.
+    A library whose flush failed is queued again after a delay that doubles
+    with every consecutive failure, up to MAX_RETRY_DELAY.
+    """
+
+    def __init__(self, interval: float = 0.05, batch_size: int = 64):
+        """
+        Starts the writer thread.
+
+        Args:
+            interval (float, optional): Seconds to wait for more mutations after the
+                first one of a batch. Defaults to 0.05.
+            batch_size (int, optional): Number of queued mutations that triggers an
+                immediate flush. Defaults to 64.
+        """
+        self.interval = interval
+        self.batch_size = batch_size
+        self._cond = threading.Condition()
+        self._dirty: dict[int, object] = {}
+        self._queued = 0
+        self._started = 0
+        self._finished = 0
+        self._closed = False
+        self._failures: OrderedDict = OrderedDict()
+        # id(library) -> (library, consecutive failures, monotonic retry time)
+        self._retries: dict[int, tuple] = {}
+        self.flushes = 0
+        self.flushed_mutations = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self._thread = threading.Thread(
+            target=self._run, name="library-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, library) -> int:
+        """
+        Queues a library for the next flush.
+
+        Args:
+            library (Library): The library with unsaved changes.
+
+        Returns:
+            int: Ticket to pass to wait() to block until the change is written.
+        """
+        with self._cond:
+            if self._closed:
+                return self._finished  # The library's sync() writes it instead.
+            self._dirty[id(library)] = library
+            self._queued += 1
+            self._cond.notify_all()
+            return self._started + 1
+
+    def wait(self, ticket: int, library=None) -> None:
+        """
+        Blocks until the flush identified by a ticket has completed.
+
+        Args:
+            ticket (int): Value returned by submit().
+            library (Library, optional): The library that was submitted. If its
+                flush failed, the error is raised here. Defaults to None.
+
+        Raises:
+            FlushError: If the library could not be written in that flush. Its
+                changes stay pending and are retried by the next flush.
+        """
+        with self._cond:
+            while self._finished < ticket:
+                self._cond.wait()
+            error = self._failures.get((ticket, id(library)))
+        if error is not None:
+            raise FlushError(f"Saving {library.data_file} failed: {error}") from error
+
+    @property
+    def closed(self) -> bool:
+        """Whether close() was called; libraries then write their changes themselves."""
+        return self._closed
+
+    def close(self) -> None:
+        """Flushes whatever is queued, retrying failed libraries, and stops the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def stats(self) -> dict:
+        """
+        Reports queue and flush counters.
+
+        Returns:
+            dict: Queue depth, flush counts and flush latency in milliseconds.
+        """
+        with self._cond:
+            return {
+                "queue_depth": self._queued,
+                "dirty_libraries": len(self._dirty),
+                "retrying_libraries": len(self._retries),
+                "flushes": self.flushes,
+                "flushed_mutations": self.flushed_mutations,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "max_flush_ms": round(self.max_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3)
+                if self.flushes
+                else 0.0,
+            }
+
+    def _requeue(self) -> Optional[float]:
+        """
+        Moves failed libraries whose delay is over (all of them once closed) back
+        into the queue. Must be called with self._cond held.
+
+        Returns:
+            Optional[float]: Seconds until the next retry is due, or None.
+        """
+        now = time.monotonic()
+        next_due = None
+        for key, (library, failures, due) in list(self._retries.items()):
+            if self._closed or due <= now:
+                self._dirty[key] = library
+            elif next_due is None or due - now < next_due:
+                next_due = due - now
+        return next_due
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    next_due = self._requeue()
+                    if self._dirty or self._closed:
+                        break
+                    self._cond.wait(next_due)
+                deadline = time.monotonic() + self.interval
+                while not self._closed and self._queued < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._dirty:
+                    return  # Closed with nothing left to write.
+                batch = list(self._dirty.values())
+                mutations = self._queued
+                self._dirty = {}
+                self._queued = 0
+                self._started += 1
+                cycle = self._started
+
+            start = time.perf_counter()
+            for library in batch:
+                try:
+                    library.flush()
+                except Exception as e:  # Keep the writer alive for other libraries.
+                    with self._cond:
+                        self.errors += 1
+                        self.last_error = f"{library.data_file}: {e}"
+                        self._failures[(cycle, id(library))] = e
+                        while len(self._failures) > FAILURES_KEPT:
+                            self._failures.popitem(last=False)
+                        failures = self._retries.pop(id(library), (None, 0))[1] + 1
+                        if not self._closed:
+                            delay = min(self.interval * 2**failures, MAX_RETRY_DELAY)
+                            self._retries[id(library)] = (
+                                library,
+                                failures,
+                                time.monotonic() + delay,
+                            )
+                else:
+                    with self._cond:
+                        self._retries.pop(id(library), None)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._cond:
+                self.flushes += 1
+                self.flushed_mutations += mutations
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self.total_flush_ms += elapsed_ms
+                self._finished = cycle
+                self._cond.notify_all()
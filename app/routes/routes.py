@@ -1,14 +1,29 @@
+import gzip
+import zlib
+from collections.abc import Iterator
+from functools import partial, wraps
+from itertools import islice
+from json import dumps as json_dumps
 from typing import Any, Optional
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, make_response
 from app.controller.business import (
     find_book,
     add_book_user,
+    add_books_user,
     subtract_book_user,
     find_top_book_user,
     change_book_page_user,
     add_book_global,
     list_books,
+    cache_stats,
+    find_books_range,
+    query_books,
+    suggest_books,
+    facet_books,
+    library_validators,
+    parse_fields,
 )
+from app.controller.cache import catalog_cache
 from app.controller.exceptions import (
     ValidationError,
     BookNotFoundError,
@@ -20,6 +35,26 @@ from app.controller.exceptions import (
 global_json = "data.json"
 user_json = "user_library/user_library.json"
 
+# Streamed responses are written in chunks of about this many bytes.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Items of a streamed array encoded together.
+STREAM_BATCH_ITEMS = 500
+
+# Same encoding as jsonify outside debug mode.
+dumps = partial(json_dumps, separators=(",", ":"), sort_keys=True)
+
+# Media types a collection can be returned in; the line-delimited ones put one
+# JSON record per line.
+JSON_MIMETYPE = "application/json"
+LINES_MIMETYPES = ("application/x-ndjson", "application/jsonl")
+
+# Content codings the full catalog is served in, by order of preference.
+CATALOG_ENCODINGS = {
+    "gzip": partial(gzip.compress, compresslevel=6),
+    "deflate": zlib.compress,
+}
+
 book_routes = Blueprint("book_routes", __name__)
 
 
@@ -34,46 +69,359 @@ def register_routes(app: Any) -> None:
     app.register_blueprint(book_routes)
 
 
-def format_response(data: dict, status: int = 200) -> tuple[dict[str, str], int]:
+def format_response(
+    data: dict, status: int = 200, records: Optional[str] = None
+) -> tuple[dict[str, str], int]:
     """
     Utility function to consistently format API responses.
 
+    Data holding an iterator (e.g. every book of a library) is streamed rather
+    than serialized in one piece.
+
     Args:
         data (Union[List[Dict[str, Any]], Dict[str, Any]]): The data to be returned in the response.
         status (int, optional): HTTP status code. Defaults to 200.
+        records (str, optional): Key of the list of records in data. When the
+            client accepts NDJSON or JSON Lines, only these are returned, one
+            per line. Defaults to None (always JSON).
 
     Returns:
         Any: JSON formatted response.
     """
-    return jsonify({"data": data, "status": status})
+    if records is not None and response_mimetype() != JSON_MIMETYPE:
+        response = lines_response(data, records)
+    elif isinstance(data, dict) and any(isinstance(v, Iterator) for v in data.values()):
+        response = Response(
+            stream_json({"data": data, "status": status}), mimetype=JSON_MIMETYPE
+        )
+    else:
+        response = jsonify({"data": data, "status": status})
+    if records is not None:
+        response.vary.add("Accept")
+    return response
+
+
+def response_mimetype() -> str:
+    """
+    Pick the media type of the current request's response from its Accept header.
+
+    Returns:
+        str: JSON_MIMETYPE, or one of LINES_MIMETYPES if the client prefers it.
+    """
+    return request.accept_mimetypes.best_match(
+        (JSON_MIMETYPE, *LINES_MIMETYPES), default=JSON_MIMETYPE
+    )
+
+
+def lines_response(data: dict, records: str) -> Response:
+    """
+    Stream the records of a response one JSON document per line.
+
+    A page's next_cursor, a range's total and a query's plan, which have no
+    line of their own, are sent in the X-Next-Cursor, X-Total-Count and
+    X-Query-Plan headers. Data without the
+    records key, such as a search for a single target attribute, is sent as
+    one line.
+
+    Args:
+        data (dict): The response data.
+        records (str): Key of the list or iterator of records in data.
+
+    Returns:
+        Response: The line-delimited response.
+    """
+    response = Response(
+        json_lines(data.get(records, (data,))), mimetype=response_mimetype()
+    )
+    if data.get("next_cursor"):
+        response.headers["X-Next-Cursor"] = data["next_cursor"]
+    if "total" in data:
+        response.headers["X-Total-Count"] = str(data["total"])
+    if "plan" in data:
+        response.headers["X-Query-Plan"] = dumps(data["plan"])
+    return response
+
+
+def conditional_get(library_path, variant, encoded: bool = False):
+    """
+    Decorator answering conditional GETs of views built from one library.
+
+    A request whose If-None-Match holds the current ETag gets an empty 304
+    before the view runs, so nothing is serialized. Successful responses carry
+    the ETag and a Last-Modified date. The ETag depends on the media type
+    negotiated from Accept, see format_response().
+
+    Args:
+        library_path (Callable[[], str]): Returns the path of the library the
+            view reads, looked up per request.
+        variant (Callable[[], str]): Describes the request arguments the
+            response depends on, so other arguments do not change the ETag.
+        encoded (bool, optional): The view compresses its response according to
+            Accept-Encoding, so the ETag depends on the coding chosen.
+            Defaults to False.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tag = f"{variant()}:{response_mimetype()}"
+            if encoded:
+                tag = f"{tag}:{response_encoding()}"
+            etag, last_modified = library_validators(library_path(), tag)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.vary.add("Accept")
+            if encoded:
+                response.vary.add("Accept-Encoding")
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def normalized_fields() -> Optional[tuple[str, ...]]:
+    """
+    Read the fields query parameter of the current request in a canonical form.
+
+    Returns:
+        Optional[tuple[str, ...]]: The requested attributes sorted, or None for all.
+
+    Raises:
+        ValidationError: If an attribute is not a book attribute.
+    """
+    fields = parse_fields(request.args.get("fields"))
+    return None if fields is None else tuple(sorted(fields))
+
+
+def list_variant() -> str:
+    """
+    Describe the arguments a list response depends on, for its ETag.
+
+    Returns:
+        str: The path, page arguments and normalized fields, as JSON.
+    """
+    try:
+        fields = normalized_fields()
+    except ValidationError:
+        fields = request.args.get("fields")  # The view answers with a 400.
+    return dumps(
+        [request.path, request.args.get("limit"), request.args.get("cursor"), fields]
+    )
+
+
+def response_encoding() -> str:
+    """
+    Pick the content coding of the current request's response.
+
+    Returns:
+        str: The client's preferred coding among CATALOG_ENCODINGS, or "identity".
+    """
+    return request.accept_encodings.best_match(
+        list(CATALOG_ENCODINGS), default="identity"
+    )
+
+
+def catalog_response(library_path: str) -> Response:
+    """
+    Serve every book of a library from its encoded and compressed body.
+
+    The body is encoded once per library generation and kept in catalog_cache,
+    then compressed the first time a client asks for each coding. A mutation
+    bumps the generation, so the next request encodes the library again.
+
+    Args:
+        library_path (str): Path to the library's data file.
+
+    Returns:
+        Response: The full list of books, compressed if the client accepts it.
+
+    Raises:
+        ValidationError: If the fields parameter is invalid.
+    """
+    # Only the fields change the body; other arguments share its entry.
+    fields = normalized_fields()
+    key = (library_path, fields)
+    # The ETag changes with the library's generation, so it stamps the entry.
+    stamp, _ = library_validators(library_path, dumps(key))
+    bodies = catalog_cache.get(key, stamp)
+    if bodies is None:
+        books = list_books(library_path, fields=request.args.get("fields"))
+        bodies = {"identity": b"".join(stream_json({"data": books, "status": 200}))}
+        catalog_cache.put(key, stamp, bodies)
+    encoding = response_encoding()
+    body = bodies.get(encoding)
+    if body is None:
+        body = bodies[encoding] = CATALOG_ENCODINGS[encoding](bodies["identity"])
+    response = Response(body, mimetype=JSON_MIMETYPE)
+    if encoding != "identity":
+        response.content_encoding = encoding
+    return response
+
+
+def json_chunks(value) -> Iterator[str]:
+    """
+    Encodes a value as JSON piece by piece, consuming iterators as arrays.
+
+    The output matches jsonify: compact separators, sorted keys and ASCII only.
+
+    Args:
+        value: A JSON-serializable value whose dicts may hold iterators.
+
+    Yields:
+        str: Consecutive pieces of the JSON document.
+    """
+    if isinstance(value, dict):
+        yield "{"
+        for i, key in enumerate(sorted(value)):
+            yield f"{',' if i else ''}{dumps(key)}:"
+            yield from json_chunks(value[key])
+        yield "}"
+    elif isinstance(value, Iterator):
+        # Items are encoded in batches, each with one call to the C encoder.
+        yield "["
+        separator = ""
+        while batch := list(islice(value, STREAM_BATCH_ITEMS)):
+            yield separator + dumps(batch)[1:-1]
+            separator = ","
+        yield "]"
+    else:
+        yield dumps(value)
+
+
+def stream_json(value, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Streams a JSON document in chunks of roughly chunk_size bytes.
+
+    Args:
+        value: A JSON-serializable value whose dicts may hold iterators.
+        chunk_size (int, optional): Bytes buffered per write. Defaults to STREAM_CHUNK_SIZE.
+
+    Yields:
+        bytes: The document, ending with a newline like jsonify.
+    """
+    buffer, size = [], 0
+    for piece in json_chunks(value):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    buffer.append("\n")
+    yield "".join(buffer).encode()
+
+
+def json_lines(records) -> Iterator[bytes]:
+    """
+    Encodes records as NDJSON, one compact JSON document per line.
+
+    Args:
+        records (Iterable): JSON-serializable records, e.g. a generator of books.
+
+    Yields:
+        bytes: Batches of complete lines.
+    """
+    records = iter(records)
+    while batch := list(islice(records, STREAM_BATCH_ITEMS)):
+        yield "".join(f"{dumps(record)}\n" for record in batch).encode()
+
+
+def range_args() -> dict[str, Optional[str]]:
+    """
+    Collect the range query parameters of the current request.
+
+    Returns:
+        dict[str, Optional[str]]: Bounds and pagination values keyed by argument name.
+    """
+    return {
+        "low": request.args.get("min"),
+        "high": request.args.get("max"),
+        "offset": request.args.get("offset"),
+        "limit": request.args.get("limit"),
+    }
+
+
+def flag_arg(name: str) -> bool:
+    """
+    Read a boolean query parameter of the current request.
+
+    Args:
+        name (str): Name of the query parameter.
+
+    Returns:
+        bool: True if the parameter is set to 1, true or yes.
+    """
+    return request.args.get(name, "false").lower() in ("1", "true", "yes")
 
 
 @book_routes.route("/user/books", methods=["GET"])
+@conditional_get(lambda: user_json, list_variant)
 def get_all_books_user() -> tuple[dict[str, str], int]:
     """
     Retrieve all books from the user library.
 
+    Pass ?limit=N to page through the library in insertion order; each page
+    carries a next_cursor to send back as ?cursor= for the following one.
+    Pass ?fields=uuid,title to return only some attributes of each book.
+
     Returns:
         Any: JSON formatted list of books or error message.
     """
     try:
-        books = list_books(user_json)
-        return format_response(books)
+        books = list_books(
+            user_json,
+            limit=request.args.get("limit"),
+            cursor=request.args.get("cursor"),
+            fields=request.args.get("fields"),
+        )
+        return format_response(books, records="Books")
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
     except BookNotFoundError as bnf:
         return {"error": str(bnf)}, 404
 
 
 @book_routes.route("/global/books", methods=["GET"])
+@conditional_get(lambda: global_json, list_variant, encoded=True)
 def get_all_books_global() -> tuple[dict[str, str], int]:
     """
     Retrieve all books from the global library.
 
+    The full list is served from a pre-encoded, pre-compressed body kept until
+    the library changes.
+    Pass ?limit=N to page through the library in insertion order; each page
+    carries a next_cursor to send back as ?cursor= for the following one.
+    Pass ?fields=uuid,title to return only some attributes of each book.
+
     Returns:
         Any: JSON formatted list of books or error message.
     """
     try:
-        books = list_books(global_json)
-        return format_response(books)
+        if (
+            request.args.get("limit") is None
+            and request.args.get("cursor") is None
+            and response_mimetype() == JSON_MIMETYPE
+        ):
+            return catalog_response(global_json)
+        books = list_books(
+            global_json,
+            limit=request.args.get("limit"),
+            cursor=request.args.get("cursor"),
+            fields=request.args.get("fields"),
+        )
+        return format_response(books, records="Books")
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
     except BookNotFoundError as bnf:
         return {"error": str(bnf)}, 404
 
@@ -88,6 +436,9 @@ def search_book_global(
     """
     Search for books in the global library based on a key-value pair with an optional target.
 
+    Pass ?fuzzy=true to tolerate typos in titles and authors, and
+    ?fields=uuid,title to return only some attributes of each book.
+
     Args:
         key (str): Attribute to search by (e.g., "author", "title").
         value (str): Value of the attribute to search for.
@@ -97,8 +448,15 @@ def search_book_global(
         Any: JSON formatted list of books or error message.
     """
     try:
-        books = find_book(key, value, global_json, target=target)
-        return format_response(books)
+        books = find_book(
+            key,
+            value,
+            global_json,
+            target=target,
+            fuzzy=flag_arg("fuzzy"),
+            fields=request.args.get("fields"),
+        )
+        return format_response(books, records="book found")
     except ValidationError as ve:
         return {"error": str(ve)}, 400
     except BookNotFoundError as bnf:
@@ -115,6 +473,9 @@ def search_book_user(
     """
     Search for books in the user library based on a key-value pair with an optional target.
 
+    Pass ?fuzzy=true to tolerate typos in titles and authors, and
+    ?fields=uuid,title to return only some attributes of each book.
+
     Args:
         key (str): Attribute to search by (e.g., "author", "title").
         value (str): Value of the attribute to search for.
@@ -124,8 +485,183 @@ def search_book_user(
         Any: JSON formatted list of books or error message.
     """
     try:
-        books = find_book(key, value, global_json, target=target)
-        return format_response(books)
+        books = find_book(
+            key,
+            value,
+            global_json,
+            target=target,
+            fuzzy=flag_arg("fuzzy"),
+            fields=request.args.get("fields"),
+        )
+        return format_response(books, records="book found")
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+    except BookNotFoundError as bnf:
+        return {"error": str(bnf)}, 404
+
+
+@book_routes.route("/global/books/suggest/<key>/<prefix>", methods=["GET"])
+def suggest_book_global(key: str, prefix: str) -> tuple[dict[str, str], int]:
+    """
+    Complete a title or author prefix from the global library.
+
+    Query parameter: k, the maximum number of completions.
+
+    Args:
+        key (str): Attribute to complete ("title" or "author").
+        prefix (str): What has been typed so far.
+
+    Returns:
+        Any: JSON formatted list of completions or error message.
+    """
+    try:
+        suggestions = suggest_books(key, prefix, global_json, k=request.args.get("k"))
+        return format_response(suggestions)
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+
+
+@book_routes.route("/user/books/suggest/<key>/<prefix>", methods=["GET"])
+def suggest_book_user(key: str, prefix: str) -> tuple[dict[str, str], int]:
+    """
+    Complete a title or author prefix from the user library.
+
+    Query parameter: k, the maximum number of completions.
+
+    Args:
+        key (str): Attribute to complete ("title" or "author").
+        prefix (str): What has been typed so far.
+
+    Returns:
+        Any: JSON formatted list of completions or error message.
+    """
+    try:
+        suggestions = suggest_books(key, prefix, user_json, k=request.args.get("k"))
+        return format_response(suggestions)
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+
+
+@book_routes.route("/global/books/facets", methods=["GET"])
+def facet_book_global() -> tuple[dict[str, str], int]:
+    """
+    Count the books of the global library per language, country or decade.
+
+    Query parameters: by, the comma-separated facets, and q, optional
+    conditions joined by AND restricting the books counted.
+
+    Returns:
+        Any: JSON formatted facet counts or error message.
+    """
+    try:
+        facets = facet_books(
+            global_json, by=request.args.get("by"), query_text=request.args.get("q")
+        )
+        return format_response(facets)
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+
+
+@book_routes.route("/user/books/facets", methods=["GET"])
+def facet_book_user() -> tuple[dict[str, str], int]:
+    """
+    Count the books of the user library per language, country or decade.
+
+    Query parameters: by, the comma-separated facets, and q, optional
+    conditions joined by AND restricting the books counted.
+
+    Returns:
+        Any: JSON formatted facet counts or error message.
+    """
+    try:
+        facets = facet_books(
+            user_json, by=request.args.get("by"), query_text=request.args.get("q")
+        )
+        return format_response(facets)
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+
+
+@book_routes.route("/global/books/range/<key>", methods=["GET"])
+def range_book_global(key: str) -> tuple[dict[str, str], int]:
+    """
+    Retrieve books from the global library whose numeric attribute lies within a range.
+
+    Query parameters: min and max (inclusive, both optional), offset and limit.
+
+    Args:
+        key (str): Numeric attribute to filter on (e.g., "year", "pages").
+
+    Returns:
+        Any: JSON formatted page of books or error message.
+    """
+    try:
+        books = find_books_range(key, global_json, **range_args())
+        return format_response(books, records="books")
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+    except BookNotFoundError as bnf:
+        return {"error": str(bnf)}, 404
+
+
+@book_routes.route("/user/books/range/<key>", methods=["GET"])
+def range_book_user(key: str) -> tuple[dict[str, str], int]:
+    """
+    Retrieve books from the user library whose numeric attribute lies within a range.
+
+    Query parameters: min and max (inclusive, both optional), offset and limit.
+
+    Args:
+        key (str): Numeric attribute to filter on (e.g., "year", "pages").
+
+    Returns:
+        Any: JSON formatted page of books or error message.
+    """
+    try:
+        books = find_books_range(key, user_json, **range_args())
+        return format_response(books, records="books")
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+    except BookNotFoundError as bnf:
+        return {"error": str(bnf)}, 404
+
+
+@book_routes.route("/global/books/query", methods=["GET"])
+def query_book_global() -> tuple[dict[str, str], int]:
+    """
+    Search the global library with several conditions joined by AND.
+
+    Query parameters: q (e.g. "author~=Tolstoy AND year>=1850") and explain.
+
+    Returns:
+        Any: JSON formatted list of books or error message.
+    """
+    try:
+        books = query_books(
+            request.args.get("q"), global_json, explain=flag_arg("explain")
+        )
+        return format_response(books, records="book found")
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+    except BookNotFoundError as bnf:
+        return {"error": str(bnf)}, 404
+
+
+@book_routes.route("/user/books/query", methods=["GET"])
+def query_book_user() -> tuple[dict[str, str], int]:
+    """
+    Search the user library with several conditions joined by AND.
+
+    Query parameters: q (e.g. "author~=Tolstoy AND year>=1850") and explain.
+
+    Returns:
+        Any: JSON formatted list of books or error message.
+    """
+    try:
+        books = query_books(
+            request.args.get("q"), user_json, explain=flag_arg("explain")
+        )
+        return format_response(books, records="book found")
     except ValidationError as ve:
         return {"error": str(ve)}, 400
     except BookNotFoundError as bnf:
@@ -152,6 +688,21 @@ def add_book_to_user_library(uuid: str) -> tuple[dict[str, str], int]:
         return {"error": str(bnf)}, 404
 
 
+@book_routes.route("/user/books/bulk", methods=["POST"])
+def add_books_to_user_library() -> tuple[dict[str, str], int]:
+    """
+    Add several books to the user library, given a JSON body {"uuids": [...]}.
+
+    Returns:
+        Any: JSON formatted per-book results or error message.
+    """
+    try:
+        response = add_books_user(request.get_json(silent=True), global_json, user_json)
+        return format_response(response)
+    except ValidationError as ve:
+        return {"error": str(ve)}, 400
+
+
 @book_routes.route("/global/books", methods=["POST"])
 def add_book_to_global_library() -> tuple[dict[str, str], int]:
     """
@@ -198,6 +749,8 @@ def get_top_user_book(target: str) -> tuple[dict[str, str], int]:
     """
     Retrieve the top book in the user library based on a specific attribute.
 
+    Pass ?k=N to retrieve the top N books instead, highest first.
+
     Args:
         target (str): Attribute to determine the "top" book (e.g., "rating").
 
@@ -205,7 +758,7 @@ def get_top_user_book(target: str) -> tuple[dict[str, str], int]:
         Any: JSON formatted book details or error message.
     """
     try:
-        book = find_top_book_user(user_json, target=target)
+        book = find_top_book_user(user_json, target=target, k=request.args.get("k"))
         return format_response(book)
     except ValidationError as ve:
         return {"error": str(ve)}, 400
@@ -239,12 +792,15 @@ def update_book_page_for_user(
     """
     Retrieve the last book read by the user based on the 'last_read_date' attribute.
 
+    Pass ?wait=false to return before the update has been written to disk.
+
     Returns:
         Any: JSON formatted book details or error message.
     """
     try:
         page_number = int(page_number)
-        response = change_book_page_user(uuid, page_number, user_json)
+        wait = request.args.get("wait", "true").lower() != "false"
+        response = change_book_page_user(uuid, page_number, user_json, wait=wait)
         return format_response(response)
     except ValidationError as ve:
         return {"error": str(ve)}, 400
@@ -254,3 +810,14 @@ def update_book_page_for_user(
         return {"error": str(vee)}, 400
     except UpdateError as ue:
         return {"error": str(ue)}, 400
+
+
+@book_routes.route("/stats", methods=["GET"])
+def get_stats() -> tuple[dict[str, str], int]:
+    """
+    Retrieve the internal cache counters.
+
+    Returns:
+        Any: JSON formatted cache counters.
+    """
+    return format_response(cache_stats())
@@ -0,0 +1,761 @@
+"""
+Micro-benchmarks for the library storage and API paths.
+
+Run a single scenario with ``python benchmark.py <scenario> [--books N]``.
+Every scenario works on generated copies of data.json in a temporary
+directory, so the real libraries are never touched.
+"""
+import argparse
+import asyncio
+import heapq
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from uuid import uuid4
+
+from flask import Flask, jsonify
+
+from app.model.indexes import fuzzy_score, normalize_text
+from app.model.kindle_model import FUZZY_THRESHOLD, Book, Library
+from app.model.library_cache import library_cache
+from app.model.query import parse_query
+from app.model.writer import GroupCommitWriter
+from app.routes import routes
+
+
+def generate_books(count: int) -> list[dict]:
+    """
+    Builds a catalog of the requested size by cycling over data.json.
+
+    Args:
+        count (int): Number of books to generate.
+
+    Returns:
+        list[dict]: Book dictionaries with unique UUIDs and titles.
+    """
+    with open("data.json", "r") as f:
+        templates = json.load(f)
+    books = []
+    for i in range(count):
+        book = dict(templates[i % len(templates)])
+        book["uuid"] = str(uuid4())
+        book["title"] = f"{book['title']} {i}"
+        books.append(book)
+    return books
+
+
+def write_library(path: str, books: list[dict]) -> None:
+    with open(path, "w") as f:
+        json.dump(books, f, indent=4)
+
+
+def report(label: str, timings: list[float], **extra) -> None:
+    """Prints mean and p95 latency in milliseconds plus any extra figures."""
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    details = " ".join(f"{key}={value}" for key, value in extra.items())
+    print(
+        f"{label:<28} mean={statistics.mean(timings) * 1000:8.3f}ms "
+        f"p95={p95 * 1000:8.3f}ms {details}"
+    )
+
+
+def bench_journal(args) -> None:
+    """Bytes written and latency per PATCH /user/books/<uuid>/page/<n>."""
+    books = generate_books(args.books)
+    for journal in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            user_json = os.path.join(tmp, "user_library.json")
+            write_library(user_json, books)
+            library_cache.configure(journal=journal)
+            routes.user_json = user_json
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            client.get("/user/books")
+
+            timings = []
+            written = 0
+            for _ in range(args.requests):
+                book = random.choice(books)
+                page = random.randint(1, book["pages"])
+                before = {
+                    path: os.stat(path) if os.path.exists(path) else None
+                    for path in (user_json, f"{user_json}.journal")
+                }
+                start = time.perf_counter()
+                client.patch(f"/user/books/{book['uuid']}/page/{page}")
+                timings.append(time.perf_counter() - start)
+                for path, st in before.items():
+                    after = os.stat(path) if os.path.exists(path) else None
+                    if after is None or (st and after.st_mtime_ns == st.st_mtime_ns):
+                        continue
+                    if path.endswith(".journal") and st:
+                        written += max(after.st_size - st.st_size, 0)
+                    else:
+                        written += after.st_size
+
+            report(
+                "journal" if journal else "full rewrite",
+                timings,
+                bytes_per_request=written // args.requests,
+            )
+    library_cache.configure(journal=False)
+
+
+def bench_group_commit(args) -> None:
+    """Concurrent PATCH page updates with and without the group-commit writer."""
+    books = generate_books(args.books)
+    for interval in (None, 0.005, 0.02):
+        with tempfile.TemporaryDirectory() as tmp:
+            user_json = os.path.join(tmp, "user_library.json")
+            write_library(user_json, books)
+            writer = GroupCommitWriter(interval=interval) if interval else None
+            library_cache.configure(writer=writer)
+            routes.user_json = user_json
+            app = Flask(__name__)
+            routes.register_routes(app)
+            app.test_client().get("/user/books")
+
+            timings = []
+            per_thread = args.requests // args.threads
+
+            def worker():
+                client = app.test_client()
+                for _ in range(per_thread):
+                    book = random.choice(books)
+                    start = time.perf_counter()
+                    client.patch(f"/user/books/{book['uuid']}/page/1")
+                    timings.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            extra = {"req_per_s": round(len(timings) / elapsed, 1)}
+            if writer is not None:
+                writer.close()
+                stats = writer.stats()
+                extra["flushes"] = stats["flushes"]
+                extra["avg_flush_ms"] = stats["avg_flush_ms"]
+            label = f"group commit {interval * 1000:g}ms" if interval else "synchronous"
+            report(label, timings, **extra)
+    library_cache.configure(writer=None)
+
+
+def bench_snapshot(args) -> None:
+    """Cold Library load time from JSON versus the binary snapshot."""
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            Library(data_file, snapshot=True)  # Writes the snapshot.
+            for label, snapshot in (("json", False), ("snapshot", True)):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    Library(data_file, snapshot=snapshot)
+                    timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings)
+
+
+def scan_find(library: Library, **kwargs) -> list[dict]:
+    """The original full-scan substring search, kept as a baseline."""
+    found = []
+    for book in library.books:
+        if all(
+            getattr(book, key, None) is not None and value in str(getattr(book, key))
+            for key, value in kwargs.items()
+        ):
+            found.append(book.to_dict())
+    return found
+
+
+def bench_search(args) -> None:
+    """
+    Substring search latency: the original exact-case full scan versus the
+    trigram index over normalized (casefolded, accent-stripped) fields.
+    """
+    queries = [
+        {"title": "Karenina 1"},
+        {"author": "Tolstoy"},
+        {"title": "Quixote"},
+        {"language": "Russian"},
+        {"title": "no such title"},
+        {"title": "anna karenina"},
+        {"author": "dostoevsky"},
+    ]
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            library = Library(data_file)
+            for label, find in (("scan", scan_find), ("index", None)):
+                timings = []
+                for _ in range(args.repeat):
+                    for query in queries:
+                        start = time.perf_counter()
+                        if find is None:
+                            library.find_books(**query)
+                        else:
+                            find(library, **query)
+                        timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings)
+
+
+def scan_fuzzy(library: Library, key: str, value: str) -> list[dict]:
+    """Fuzzy search by scoring every book, kept as a baseline."""
+    query = normalize_text(value)
+    scored = [
+        (-fuzzy_score(query, normalize_text(getattr(book, key))), book)
+        for book in library.books
+    ]
+    return [book.to_dict() for score, book in scored if -score >= FUZZY_THRESHOLD]
+
+
+def bench_fuzzy(args) -> None:
+    """Typo-tolerant search latency: scoring every book versus the trigram index."""
+    queries = [
+        ("title", "Anna Karenia"),
+        ("author", "Tolstoi"),
+        ("author", "dostoyevsky"),
+        ("title", "Don Quixotte"),
+        ("title", "zzzz qqqq"),
+    ]
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            library = Library(data_file)
+            for label, find in (
+                ("scan", lambda key, value: scan_fuzzy(library, key, value)),
+                ("index", library.fuzzy_find_books),
+            ):
+                timings = []
+                for _ in range(args.repeat):
+                    for key, value in queries:
+                        start = time.perf_counter()
+                        find(key, value)
+                        timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings)
+
+
+def bench_suggest(args) -> None:
+    """
+    Search-as-you-type latency per keystroke: a substring search on the title
+    (what clients did before) versus completing the prefix from the sorted array.
+    """
+    prefixes = ["a", "an", "ann", "anna", "anna k", "the b", "don q", "zzz"]
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            library = Library(data_file)
+            for label, find in (
+                ("search", lambda prefix: library.find_books(title=prefix)),
+                ("suggest", lambda prefix: library.suggest("title", prefix, 10)),
+            ):
+                timings = []
+                for _ in range(args.repeat):
+                    for prefix in prefixes:
+                        start = time.perf_counter()
+                        find(prefix)
+                        timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings)
+
+
+def bench_list(args) -> None:
+    """
+    GET /global/books latency: the whole catalog versus one 50-book page, and
+    versus the whole catalog projected to three fields.
+    """
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            routes.global_json = data_file
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            page = client.get("/global/books?limit=50").get_json()["data"]
+            for label, url in (
+                ("full", "/global/books"),
+                ("first page", "/global/books?limit=50"),
+                ("next page", f"/global/books?cursor={page['next_cursor']}"),
+                ("3 fields", "/global/books?fields=uuid,title,author"),
+            ):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    body = client.get(url).get_data()
+                    timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings, bytes=len(body))
+    routes.global_json = "data.json"
+
+
+def scan_top(library: Library, key: str, k: int) -> list[dict]:
+    """The original top-book lookup: every book to a dict, then a max."""
+    books = library.list_books()
+    if k == 1:
+        return [max(books, key=lambda book: book.get(key, float("-inf")))]
+    return heapq.nlargest(k, books, key=lambda book: book[key])
+
+
+def bench_top(args) -> None:
+    """Top-k latency: scanning dicts versus reading the end of the sorted index."""
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            library = Library(data_file)
+            for label, find in (("scan", scan_top), ("index", None)):
+                for key, k in (("last_read_date", 1), ("pages", 10)):
+                    timings = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        if find is None:
+                            library.top_books(key, k)
+                        else:
+                            find(library, key, k)
+                        timings.append(time.perf_counter() - start)
+                    report(f"{label} {key} k={k} {size}", timings)
+
+
+def bench_facets(args) -> None:
+    """
+    Facet count latency: counting a downloaded catalog client-side versus the
+    maintained counters, and counters restricted by a query.
+    """
+    fields = ["language", "country", "decade"]
+    predicates = parse_query("year>=1800 AND year<1900")
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            library = Library(data_file)
+
+            def client_side():
+                books = json.loads(json.dumps(library.list_books()))
+                for field in ("language", "country"):
+                    Counter(book[field] for book in books)
+                Counter(book["year"] // 10 * 10 for book in books)
+
+            for label, count in (
+                ("client side", client_side),
+                ("counters", lambda: library.facets(fields)),
+                ("filtered", lambda: library.facets(fields, predicates)),
+            ):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    count()
+                    timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings)
+
+
+SERVER_PATHS = [
+    "/global/books?limit=50&fields=uuid,title,author",
+    "/global/books/search/author/Tolstoy",
+    "/global/books/suggest/title/the",
+    "/global/books/facets?by=language",
+    "/global/books/range/year?min=1800&max=1850&limit=20",
+]
+
+
+def start_server(workdir: str, port: int, **env) -> subprocess.Popen:
+    """Launches main.py from a directory holding the libraries to serve."""
+    environment = dict(os.environ, KINDLE_PORT=str(port), **env)
+    environment["PYTHONPATH"] = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath("main.py")],
+        cwd=workdir,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"Server on port {port} did not start.")
+
+
+def http_client(port: int, count: int) -> list[float]:
+    """Sends count GET requests over fresh connections, returning their latencies."""
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("GET", SERVER_PATHS[i % len(SERVER_PATHS)])
+        connection.getresponse().read()
+        connection.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_server(args) -> None:
+    """
+    Read throughput of the Flask development server versus the pre-forking
+    production server, with --threads client processes.
+    """
+    books = generate_books(args.books)
+    modes = (
+        ("dev server", {}),
+        (f"prefork {args.workers} workers", {"KINDLE_WORKERS": str(args.workers)}),
+    )
+    for port, (label, env) in enumerate(modes, start=5090):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_library(os.path.join(tmp, "data.json"), books)
+            os.makedirs(os.path.join(tmp, "user_library"))
+            write_library(os.path.join(tmp, "user_library", "user_library.json"), [])
+            server = start_server(tmp, port, **env)
+            try:
+                http_client(port, len(SERVER_PATHS))  # Warm up.
+                per_client = args.requests // args.threads
+                start = time.perf_counter()
+                with ProcessPoolExecutor(max_workers=args.threads) as pool:
+                    results = pool.map(
+                        http_client, [port] * args.threads, [per_client] * args.threads
+                    )
+                    timings = [t for result in results for t in result]
+                elapsed = time.perf_counter() - start
+            finally:
+                server.terminate()
+                server.wait()
+            report(label, timings, req_per_s=round(len(timings) / elapsed, 1))
+
+
+async def async_request(port: int, method: str, path: str, body: bytes = b"") -> int:
+    """Sends one HTTP/1.1 request on a fresh connection and returns its status."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = (
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(headers.encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def concurrent_load(port: int, clients: int, requests: int, template: dict):
+    """
+    Runs clients concurrent GET loops while one client keeps adding books,
+    each add rewriting the whole catalog.
+    """
+    timings = []
+    done = asyncio.Event()
+
+    async def reader(count: int):
+        for i in range(count):
+            start = time.perf_counter()
+            await async_request(port, "GET", SERVER_PATHS[i % len(SERVER_PATHS)])
+            timings.append(time.perf_counter() - start)
+
+    async def writer():
+        while not done.is_set():
+            book = dict(template, title=f"Added {uuid4()}")
+            body = json.dumps(book).encode()
+            await async_request(port, "POST", "/global/books", body)
+
+    writing = asyncio.create_task(writer())
+    start = time.perf_counter()
+    await asyncio.gather(*(reader(requests // clients) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await writing
+    return timings, elapsed
+
+
+def bench_asgi(args) -> None:
+    """
+    GET latency under --clients simultaneous clients while books are being added:
+    the threaded development server versus the ASGI adapter with bounded
+    read and write pools.
+    """
+    books = generate_books(args.books)
+    template = {key: value for key, value in books[0].items() if key != "uuid"}
+    modes = (("dev server", {}), ("asgi", {"KINDLE_ASGI": "1"}))
+    for port, (label, env) in enumerate(modes, start=5095):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_library(os.path.join(tmp, "data.json"), books)
+            os.makedirs(os.path.join(tmp, "user_library"))
+            write_library(os.path.join(tmp, "user_library", "user_library.json"), [])
+            server = start_server(tmp, port, **env)
+            try:
+                http_client(port, len(SERVER_PATHS))  # Warm up.
+                timings, elapsed = asyncio.run(
+                    concurrent_load(port, args.clients, args.requests, template)
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            report(label, timings, req_per_s=round(len(timings) / elapsed, 1))
+
+
+def bench_stream(args) -> None:
+    """
+    Peak memory traced while answering GET /global/books: building the whole
+    response with jsonify versus streaming it from the library.
+    """
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            routes.global_json = data_file
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            client.get("/global/books?limit=1")  # Loads the library.
+            library = library_cache.get(data_file)
+
+            def jsonify_all():
+                with app.app_context():
+                    books = library.list_books()
+                    envelope = {"status": "success", "Books": books}
+                    jsonify({"data": envelope, "status": 200}).get_data()
+
+            def stream_all():
+                response = client.get("/global/books", buffered=False)
+                for _ in response.response:
+                    pass
+                response.close()
+
+            for label, answer in (("jsonify", jsonify_all), ("stream", stream_all)):
+                tracemalloc.start()
+                start = time.perf_counter()
+                answer()
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(
+                    f"{label} {size} books: peak={peak / 2**20:.1f}MB "
+                    f"time={elapsed * 1000:.0f}ms"
+                )
+    routes.global_json = "data.json"
+
+
+def bench_conditional(args) -> None:
+    """Polling GET /global/books: full responses versus If-None-Match 304s."""
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            routes.global_json = data_file
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            etag = client.get("/global/books").headers["ETag"]
+            for label, headers in (
+                ("full", {}),
+                ("not modified", {"If-None-Match": etag}),
+            ):
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    response = client.get("/global/books", headers=headers)
+                    response.get_data()
+                    timings.append(time.perf_counter() - start)
+                report(f"{label} {size} books", timings, status=response.status_code)
+    routes.global_json = "data.json"
+
+
+def bench_catalog(args) -> None:
+    """
+    Requests per second for the full book list: encoding it on every request
+    versus serving the cached body, plain and gzip-compressed.
+    """
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            # Both routes read the same library; only /global/books is cached.
+            routes.global_json = routes.user_json = data_file
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            for label, path, headers in (
+                ("encoded", "/user/books", {}),
+                ("cached", "/global/books", {}),
+                ("cached gzip", "/global/books", {"Accept-Encoding": "gzip"}),
+            ):
+                client.get(path, headers=headers).get_data()  # Warm up.
+                timings = []
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = client.get(path, headers=headers)
+                    body = response.get_data()
+                    timings.append(time.perf_counter() - start)
+                report(
+                    f"{label} {size} books",
+                    timings,
+                    req_per_s=round(len(timings) / sum(timings), 1),
+                    bytes=len(body),
+                )
+    routes.global_json = "data.json"
+    routes.user_json = "user_library/user_library.json"
+
+
+def bench_ndjson(args) -> None:
+    """
+    A client reading every book of GET /user/books: parsing one JSON array
+    versus handling NDJSON lines as they arrive. Reports the time to the first
+    record and the client's peak memory.
+    """
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            routes.user_json = data_file
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            client.get("/user/books?limit=1")  # Loads the library.
+
+            def read_array():
+                response = client.get("/user/books", buffered=False)
+                body = b"".join(response.response)
+                response.close()
+                books = json.loads(body)["data"]["Books"]
+                first = time.perf_counter()
+                return first, sum(1 for _ in books)
+
+            def read_lines():
+                headers = {"Accept": "application/x-ndjson"}
+                response = client.get("/user/books", headers=headers, buffered=False)
+                first, count, rest = None, 0, b""
+                for chunk in response.response:
+                    *lines, rest = (rest + chunk).split(b"\n")
+                    for line in lines:
+                        json.loads(line)
+                        first = first or time.perf_counter()
+                        count += 1
+                response.close()
+                return first, count
+
+            for label, read in (("array", read_array), ("ndjson", read_lines)):
+                tracemalloc.start()
+                start = time.perf_counter()
+                first, count = read()
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(
+                    f"{label} {count} books: first={(first - start) * 1000:.1f}ms "
+                    f"total={elapsed * 1000:.0f}ms peak={peak / 2**20:.1f}MB"
+                )
+    routes.user_json = "user_library/user_library.json"
+
+
+def bench_bulk(args) -> None:
+    """
+    Onboarding a user with --requests books from a --books catalog: one
+    POST /user/books/<uuid> per book versus a single POST /user/books/bulk.
+    """
+    books = generate_books(args.books)
+    uuids = [book["uuid"] for book in random.sample(books, args.requests)]
+    for label in ("one by one", "bulk"):
+        with tempfile.TemporaryDirectory() as tmp:
+            routes.global_json = os.path.join(tmp, "data.json")
+            routes.user_json = os.path.join(tmp, "user_library.json")
+            write_library(routes.global_json, books)
+            write_library(routes.user_json, [])
+            app = Flask(__name__)
+            routes.register_routes(app)
+            client = app.test_client()
+            client.get("/global/books?limit=1")  # Loads both libraries.
+            client.get("/user/books?limit=1")
+
+            start = time.perf_counter()
+            if label == "bulk":
+                client.post("/user/books/bulk", json={"uuids": uuids})
+            else:
+                for uuid in uuids:
+                    client.post(f"/user/books/{uuid}")
+            elapsed = time.perf_counter() - start
+            with open(routes.user_json) as f:
+                added = len(json.load(f))
+            print(f"{label}: {added} books added in {elapsed * 1000:.1f}ms")
+    routes.global_json = "data.json"
+    routes.user_json = "user_library/user_library.json"
+
+
+class DictBook:
+    """The original Book layout: a per-instance __dict__ and no interning."""
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+
+def bench_memory(args) -> None:
+    """Bytes per book held in memory after loading a JSON catalog."""
+    for size in (int(size) for size in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, "data.json")
+            write_library(data_file, generate_books(size))
+            for label, cls in (("dict", DictBook), ("slots", Book)):
+                tracemalloc.start()
+                with open(data_file, "r") as f:
+                    data = json.load(f)
+                books = [cls(**book) for book in data]
+                del data
+                current, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f"{label} {size} books: {current // len(books)} bytes/book")
+                del books
+
+
+SCENARIOS = {
+    "journal": bench_journal,
+    "group_commit": bench_group_commit,
+    "snapshot": bench_snapshot,
+    "search": bench_search,
+    "fuzzy": bench_fuzzy,
+    "suggest": bench_suggest,
+    "list": bench_list,
+    "top": bench_top,
+    "facets": bench_facets,
+    "server": bench_server,
+    "asgi": bench_asgi,
+    "stream": bench_stream,
+    "conditional": bench_conditional,
+    "catalog": bench_catalog,
+    "ndjson": bench_ndjson,
+    "bulk": bench_bulk,
+    "memory": bench_memory,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--books", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    SCENARIOS[args.scenario](args)
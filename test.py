@@ -1,7 +1,31 @@
+import gzip
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import zlib
 from copy import deepcopy
 import unittest
+from io import BytesIO
+from unittest import mock
 from flask import Flask, json
 from app.routes import routes
+from app.controller.asgi import ThreadPoolASGI
+from app.controller.business import (
+    REQUIRED_KEYS,
+    add_book_global,
+    find_book,
+    list_books,
+)
+from app.controller.cache import catalog_cache, search_cache
+from app.controller.exceptions import BookNotFoundError, ValidationError
+from app.model import kindle_model, sqlite_model
+from app.model.kindle_model import Book, Library
+from app.model.library_cache import LibraryCache, library_cache
+from app.model.query import parse_query
+from app.model.sqlite_model import SQLiteLibrary, import_json_library
+from app.model.writer import FlushError, GroupCommitWriter
 from parameterized import parameterized
 
 
@@ -43,19 +67,77 @@ class BookRoutesTestCase(unittest.TestCase):
             ("POST", "/global/books", 200, dict, valid_book),
             ("POST", "/global/books", 400, dict, invalid_book),
             ("GET", "/global/books", 200, dict),
+            ("GET", "/global/books?limit=10", 200, dict),
+            ("GET", "/global/books?limit=0", 400, dict),
+            ("GET", "/global/books?limit=10&cursor=WyJvdGhlciIsOSwieCJd", 400, dict),
+            ("GET", "/global/books?cursor=invalid", 400, dict),
+            ("GET", "/global/books?fields=uuid,title,author", 200, dict),
+            ("GET", "/global/books?fields=uuid,isbn", 400, dict),
             ("GET", f"/global/books/search/title/{test_real_book}", 200, dict),
             ("GET", f"/global/books/search/title/{test_real_book}/author", 200, dict),
             ("GET", "/global/books/search/test/test", 400, dict),
             ("GET", "/global/books/search/title/1", 404, dict),
+            (
+                "GET",
+                f"/global/books/search/title/{test_real_book}?fields=uuid",
+                200,
+                dict,
+            ),
+            (
+                "GET",
+                "/global/books/search/title/Oedipus the Kimg?fuzzy=true",
+                200,
+                dict,
+            ),
+            ("GET", "/global/books/search/year/1877?fuzzy=true", 400, dict),
+            ("GET", "/global/books/search/author/Kafca?fuzzy=true", 200, dict),
+            ("GET", "/global/books/search/title/kafka?fuzzy=true", 404, dict),
+            ("GET", "/global/books/suggest/title/oedi?k=5", 200, dict),
+            ("GET", "/global/books/suggest/year/18", 400, dict),
+            ("GET", "/global/books/suggest/title/oedi?k=0", 400, dict),
+            ("GET", "/global/books/facets", 200, dict),
+            ("GET", "/global/books/facets?by=decade&q=language%3DEnglish", 200, dict),
+            ("GET", "/global/books/facets?by=genre", 400, dict),
+            ("GET", "/global/books/range/year?min=1800&max=1899&limit=5", 200, dict),
+            ("GET", "/global/books/range/title?min=1", 400, dict),
+            ("GET", "/global/books/range/year?min=abc", 400, dict),
+            ("GET", "/global/books/range/year?min=3000", 404, dict),
+            (
+                "GET",
+                "/global/books/query?q=author~%3DTolstoy%20AND%20year%3E%3D1850",
+                200,
+                dict,
+            ),
+            (
+                "GET",
+                "/global/books/query?q=language%3DRussian%20AND%20year%3C1800&explain=1",
+                200,
+                dict,
+            ),
+            ("GET", "/global/books/query?q=genre%3DNovel", 400, dict),
+            ("GET", "/global/books/query?q=year%3E%3Dabc", 400, dict),
+            ("GET", "/global/books/query?q=author~%3DNobody", 404, dict),
             ("GET", "/user/books/top/last_read_date", 404, dict),
             ("GET", "/user/books/last-read", 404, dict),
             ("POST", f"/user/books/{test_uuid}", 200, dict),
+            ("POST", "/user/books/bulk", 200, dict, {"uuids": ["missing-uuid"]}),
+            ("POST", "/user/books/bulk", 400, dict, {"uuids": test_uuid}),
             ("GET", "/user/books", 200, dict),
+            ("GET", "/user/books?limit=10", 200, dict),
+            ("GET", "/user/books?limit=0", 400, dict),
+            ("GET", "/user/books?fields=uuid,title", 200, dict),
             ("GET", f"/user/books/search/title/{test_real_book}", 200, dict),
             ("GET", f"/user/books/search/title/{test_real_book}/author", 200, dict),
             ("GET", "/user/books/search/test/test", 400, dict),
             ("GET", "/user/books/search/title/1", 404, dict),
+            ("GET", "/user/books/search/title/Oedipus the Kimg?fuzzy=true", 200, dict),
+            ("GET", "/user/books/suggest/author/leo", 200, dict),
+            ("GET", "/user/books/facets?by=language", 200, dict),
+            ("GET", "/user/books/range/pages?max=100", 200, dict),
+            ("GET", "/user/books/query?q=title~%3DIlyich", 200, dict),
             ("GET", "/user/books/top/last_read_date", 200, dict),
+            ("GET", "/user/books/top/pages?k=3", 200, dict),
+            ("GET", "/user/books/top/pages?k=0", 400, dict),
             ("GET", "/user/books/last-read", 200, dict),
             (
                 "PATCH",
@@ -95,6 +177,7 @@ class BookRoutesTestCase(unittest.TestCase):
                 404,
                 dict,
             ),
+            ("GET", "/stats", 200, dict),
         ]
     )
     def test_endpoint_responses(
@@ -134,6 +217,538 @@ class BookRoutesTestCase(unittest.TestCase):
             data = self.extract_data(response)
             self.assertIsInstance(data, expected_type)
 
+    def test_conditional_get(self):
+        """A repeated list request with the ETag it was given gets a 304."""
+        for endpoint in ("/global/books", "/user/books"):
+            with self.subTest(endpoint=endpoint):
+                response = self.client.get(endpoint)
+                self.assertEqual(response.status_code, 200)
+                etag = response.headers["ETag"]
+                self.assertIn("Last-Modified", response.headers)
+
+                response = self.client.get(endpoint, headers={"If-None-Match": etag})
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.data, b"")
+
+                response = self.client.get(
+                    f"{endpoint}?limit=1", headers={"If-None-Match": etag}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_bulk_add(self):
+        """A bulk add writes every new book once and reports each UUID."""
+        with open(routes.global_json) as f:
+            uuids = [book["uuid"] for book in json.load(f)[:3]]
+        with tempfile.TemporaryDirectory() as tmp:
+            user_json = routes.user_json
+            routes.user_json = os.path.join(tmp, "user_library.json")
+            self.addCleanup(setattr, routes, "user_json", user_json)
+            self.addCleanup(library_cache.invalidate, routes.user_json)
+            with open(routes.user_json, "w") as f:
+                json.dump([], f)
+
+            body = {"uuids": [uuids[0], uuids[1], uuids[0], "missing-uuid"]}
+            data = self.extract_data(self.client.post("/user/books/bulk", json=body))
+            self.assertEqual(data["added"], 2)
+            self.assertEqual(
+                [result["status"] for result in data["results"]],
+                ["added", "added", "duplicate", "not found"],
+            )
+            listed = self.extract_data(self.client.get("/user/books"))["Books"]
+            self.assertEqual([book["uuid"] for book in listed], uuids[:2])
+            with open(routes.user_json) as f:
+                self.assertEqual([book["uuid"] for book in json.load(f)], uuids[:2])
+
+            body = {"uuids": [uuids[1], uuids[2]]}
+            data = self.extract_data(self.client.post("/user/books/bulk", json=body))
+            self.assertEqual(data["added"], 1)
+            self.assertEqual(
+                [result["status"] for result in data["results"]],
+                ["already in library", "added"],
+            )
+
+    def test_compressed_catalog(self):
+        """The full global list is served in the coding the client accepts."""
+        plain = self.client.get("/global/books")
+        self.assertNotIn("Content-Encoding", plain.headers)
+        for encoding, decompress in (
+            ("gzip", gzip.decompress),
+            ("deflate", zlib.decompress),
+        ):
+            with self.subTest(encoding=encoding):
+                response = self.client.get(
+                    "/global/books", headers={"Accept-Encoding": encoding}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers["Content-Encoding"], encoding)
+                self.assertIn("Accept-Encoding", response.headers["Vary"])
+                self.assertNotEqual(response.headers["ETag"], plain.headers["ETag"])
+                self.assertEqual(decompress(response.data), plain.data)
+
+    def test_catalog_ignores_unrelated_arguments(self):
+        """Arguments that do not change the full list share its ETag and cache entry."""
+        plain = self.client.get("/global/books")
+        hits = catalog_cache.hits
+        for query in ("x=1", "x=2", "y=3"):
+            response = self.client.get(f"/global/books?{query}")
+            self.assertEqual(response.headers["ETag"], plain.headers["ETag"])
+        self.assertEqual(catalog_cache.hits, hits + 3)
+
+        projected = self.client.get("/global/books?fields=uuid,title")
+        reordered = self.client.get("/global/books?fields=title,uuid")
+        self.assertEqual(projected.headers["ETag"], reordered.headers["ETag"])
+
+    def test_ndjson(self):
+        """Lists and searches return one book per line when NDJSON is accepted."""
+        headers = {"Accept": "application/x-ndjson"}
+        for endpoint, records in (
+            ("/global/books", "Books"),
+            ("/user/books?limit=2", "Books"),
+            ("/global/books/search/author/Tolstoy", "book found"),
+            ("/global/books/range/pages?max=300", "books"),
+            ("/global/books/query?q=author~%3DTolstoy", "book found"),
+        ):
+            with self.subTest(endpoint=endpoint):
+                expected = self.extract_data(self.client.get(endpoint))[records]
+                response = self.client.get(endpoint, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.mimetype, "application/x-ndjson")
+                self.assertIn("Accept", response.headers["Vary"])
+                lines = response.data.decode().splitlines()
+                self.assertEqual([json.loads(line) for line in lines], expected)
+
+        endpoint = "/global/books/query?q=author~%3DTolstoy&explain=true"
+        plan = self.extract_data(self.client.get(endpoint))["plan"]
+        response = self.client.get(endpoint, headers=headers)
+        self.assertEqual(json.loads(response.headers["X-Query-Plan"]), plan)
+
+        endpoint = "/global/books/range/pages?max=300&limit=1"
+        total = self.extract_data(self.client.get(endpoint))["total"]
+        response = self.client.get(endpoint, headers=headers)
+        self.assertEqual(response.headers["X-Total-Count"], str(total))
+
+    def test_asgi_path_is_decoded_once(self):
+        """The ASGI server already decoded the path; %25 must stay a literal %."""
+        scope = {"method": "GET", "path": "/global/books/search/title/100%25"}
+        environ = ThreadPoolASGI.environ(scope, BytesIO())
+        self.assertEqual(environ["PATH_INFO"], "/global/books/search/title/100%25")
+
+
+class LibraryModelTestCase(unittest.TestCase):
+    def setUp(self):
+        """Copy two books of the global library into a scratch data file."""
+        with open(routes.global_json) as f:
+            self.books = json.load(f)[:3]
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp.name, "library.json")
+        with open(self.data_file, "w") as f:
+            json.dump([], f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failed_flush_is_reported_and_retried(self):
+        """A save the writer could not do fails sync() and is written later."""
+        writer = GroupCommitWriter(interval=0.001)
+        self.addCleanup(writer.close)
+        library = Library(self.data_file, writer=writer)
+
+        def fail():
+            raise OSError("disk full")
+
+        library.save_library = fail
+        with self.assertRaises(FlushError):
+            library.add_book(Book(**self.books[0]))
+        self.assertTrue(library.dirty)
+
+        del library.save_library
+        library.add_book(Book(**self.books[1]))
+        reloaded = Library(self.data_file)
+        self.assertEqual(len(reloaded), 2)
+
+    def test_failed_flush_is_retried_without_new_writes(self):
+        """The writer queues a failed library again by itself, and on close."""
+        for interval, close in ((0.001, False), (10, True)):
+            with open(self.data_file, "w") as f:
+                json.dump([], f)
+            writer = GroupCommitWriter(interval=interval, batch_size=1)
+            self.addCleanup(writer.close)
+            library = Library(self.data_file, writer=writer)
+            library.save_library = mock.Mock(side_effect=OSError("disk full"))
+            with self.assertRaises(FlushError):
+                library.add_book(Book(**self.books[0]))
+
+            del library.save_library
+            if close:
+                writer.close()  # Long before the retry would be due.
+            for _ in range(200):
+                if not library.dirty:
+                    break
+                threading.Event().wait(0.01)
+            self.assertEqual(len(Library(self.data_file)), 1)
+
+    def test_torn_journal_tail_is_cut_off(self):
+        """A commit after a torn journal write is replayed on the next load."""
+        library = Library(self.data_file, journal=True)
+        library.add_book(Book(**self.books[0]))
+        with open(library.journal_file, "a") as f:
+            f.write('{"op": "add", "bo')  # Crash in the middle of an append.
+
+        library = Library(self.data_file, journal=True)
+        self.assertEqual(len(library), 1)
+        library.add_book(Book(**self.books[1]))
+
+        reloaded = Library(self.data_file, journal=True)
+        self.assertEqual(len(reloaded), 2)
+        self.assertEqual(reloaded.journal_records, 2)
+
+    def test_cursor_after_removed_book(self):
+        """A cursor past a removed book resumes in its load and expires on reload."""
+        with open(self.data_file, "w") as f:
+            json.dump(self.books, f)
+        self.addCleanup(library_cache.invalidate, self.data_file)
+        first = list_books(self.data_file, limit="1")
+        library_cache.get(self.data_file).remove_book(self.books[0]["uuid"])
+
+        second = list_books(self.data_file, limit="1", cursor=first["next_cursor"])
+        self.assertEqual(second["Books"][0]["uuid"], self.books[1]["uuid"])
+
+        library_cache.invalidate(self.data_file)  # As after a restart.
+        with self.assertRaises(ValidationError):
+            list_books(self.data_file, limit="1", cursor=first["next_cursor"])
+        third = list_books(self.data_file, limit="1", cursor=second["next_cursor"])
+        self.assertEqual(third["Books"][0]["uuid"], self.books[2]["uuid"])
+
+    def test_remove_leaves_running_iteration_alone(self):
+        """Removing a book does not shift the list a reader is already walking."""
+        with open(self.data_file, "w") as f:
+            json.dump(self.books, f)
+        library = Library(self.data_file)
+        seen = []
+        for book in library.books:
+            seen.append(book.uuid)
+            if len(seen) == 1:
+                library.remove_book(book.uuid)
+        self.assertEqual(seen, [book["uuid"] for book in self.books])
+        self.assertEqual(
+            [book.uuid for book in library.books],
+            [book["uuid"] for book in self.books[1:]],
+        )
+
+    def test_libraries_sharing_a_file_keep_each_others_writes(self):
+        """Two copies of a library with their own writers never drop a book."""
+        for journal in (False, True):
+            with open(self.data_file, "w") as f:
+                json.dump([], f)
+            copies = []
+            for _ in range(2):
+                writer = GroupCommitWriter(interval=0.01)
+                self.addCleanup(writer.close)
+                copies.append(
+                    Library(
+                        self.data_file,
+                        journal=journal,
+                        checkpoint_every=2,
+                        writer=writer,
+                    )
+                )
+            first, second = copies
+            first.add_book(Book(**self.books[0]), wait=False)
+            second.add_book(Book(**self.books[1]), wait=False)
+            first.add_book(Book(**self.books[2]), wait=False)
+            first.sync()
+            second.sync()
+            self.assertEqual(
+                {book.uuid for book in Library(self.data_file, journal=journal).books},
+                {book["uuid"] for book in self.books},
+                f"journal={journal}",
+            )
+
+    def test_forked_copy_gets_its_own_load_id(self):
+        """A worker forked with a loaded library does not share its load_id."""
+        library = Library(self.data_file)
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(write_end, library.load_id.encode())
+            os._exit(0)
+        os.close(write_end)
+        child_load_id = os.read(read_end, 64).decode()
+        os.close(read_end)
+        os.waitpid(pid, 0)
+        self.assertNotEqual(child_load_id, library.load_id)
+
+    def test_save_writes_outside_the_lock(self):
+        """Readers can take the library lock while a save encodes the books."""
+        library = Library(self.data_file)
+        free = []
+        dump = kindle_model.json.dump
+
+        def probe(*args, **kwargs):
+            def reader():
+                if library.lock.acquire(timeout=1):
+                    library.lock.release()
+                    free.append(True)
+
+            thread = threading.Thread(target=reader)
+            thread.start()
+            thread.join()
+            dump(*args, **kwargs)
+
+        with mock.patch.object(kindle_model.json, "dump", probe):
+            library.add_book(Book(**self.books[0]))
+        self.assertEqual(free, [True])
+        self.assertEqual(len(Library(self.data_file)), 1)
+
+    def test_slow_load_does_not_block_other_libraries(self):
+        """A library being loaded does not hold up cache hits on another path."""
+        cache = LibraryCache()
+        cache.get(self.data_file)
+        other_file = os.path.join(self.tmp.name, "other.json")
+        started, release = threading.Event(), threading.Event()
+
+        def slow_open(data_file, **options):
+            started.set()
+            release.wait(5)
+            return Library(data_file, **options)
+
+        with mock.patch("app.model.library_cache.open_library", slow_open):
+            loader = threading.Thread(target=cache.get, args=(other_file,))
+            loader.start()
+            started.wait(5)
+            got = []
+            reader = threading.Thread(
+                target=lambda: got.append(cache.get(self.data_file))
+            )
+            reader.start()
+            reader.join(1)
+            served_while_loading = bool(got)
+            release.set()
+            loader.join()
+            reader.join()
+        self.assertTrue(served_while_loading)
+
+    def test_fresh_snapshot_is_loaded_instead_of_json(self):
+        """A snapshot matching the data file is read without parsing the JSON."""
+        with open(self.data_file, "w") as f:
+            json.dump(self.books, f)
+        Library(self.data_file, snapshot=True)
+        self.assertTrue(os.path.exists(f"{self.data_file}.snapshot"))
+        with mock.patch.object(kindle_model.json, "load") as load:
+            library = Library(self.data_file, snapshot=True)
+        load.assert_not_called()
+        self.assertEqual(
+            [book.uuid for book in library.books],
+            [book["uuid"] for book in self.books],
+        )
+
+    def test_stale_snapshot_falls_back_to_json(self):
+        """A snapshot of another version or of an older data file is ignored."""
+        with open(self.data_file, "w") as f:
+            json.dump(self.books, f)
+        Library(self.data_file, snapshot=True)
+        with open(self.data_file, "w") as f:
+            json.dump(self.books[:2], f)
+        self.assertEqual(len(Library(self.data_file, snapshot=True)), 2)
+
+        rows = [Book(**book).to_row() for book in self.books]
+        stamp = kindle_model.file_stamp(self.data_file)
+        with open(f"{self.data_file}.snapshot", "wb") as f:
+            pickle.dump((kindle_model.SNAPSHOT_VERSION + 1, stamp, rows), f)
+        self.assertEqual(len(Library(self.data_file, snapshot=True)), 2)
+
+    def test_save_refreshes_snapshot(self):
+        """Saving the library rewrites the snapshot to match the new data file."""
+        library = Library(self.data_file, snapshot=True)
+        library.add_book(Book(**self.books[0]))
+        rows = library.load_snapshot()
+        self.assertEqual([book.uuid for book in rows], [self.books[0]["uuid"]])
+
+    def test_search_miss_is_forgotten_after_an_add(self):
+        """A cached miss is dropped as stale once the library changes."""
+        with open(self.data_file, "w") as f:
+            json.dump(self.books, f)
+        new_book = {key: self.books[0][key] for key in REQUIRED_KEYS}
+        new_book["title"] = "A Book Nobody Wrote"
+        with self.assertRaises(BookNotFoundError):
+            find_book("title", "nobody wrote", self.data_file)
+
+        stale = search_cache.stale
+        add_book_global(new_book, self.data_file)
+        found = find_book("title", "nobody wrote", self.data_file)
+        self.assertEqual(found["book found"][0]["title"], "A Book Nobody Wrote")
+        self.assertEqual(search_cache.stale, stale + 1)
+
+    def test_fuzzy_search_tolerates_typos_in_short_names(self):
+        """One typo in a short word still finds it, closest values first."""
+        books = [
+            dict(self.books[0], uuid=str(i), title=title, author=author)
+            for i, (title, author) in enumerate(
+                [
+                    ("The Trial", "Franz Kafka"),
+                    ("Odyssey", "Homer"),
+                    ("Ulysses", "James Joyce"),
+                    ("War and Peace", "Leo Tolstoy"),
+                    ("Hamlet Revisited", "Tom Stoppard"),
+                    ("Hamlet", "William Shakespeare"),
+                    ("Hamlets", "Nobody"),
+                    ("The Aeneid", "Virgil"),
+                ]
+            )
+        ]
+        with open(self.data_file, "w") as f:
+            json.dump(books, f)
+        library = Library(self.data_file)
+
+        def authors(query):
+            return [
+                book["author"] for book in library.fuzzy_find_books("author", query)
+            ]
+
+        self.assertEqual(authors("Kafca"), ["Franz Kafka"])
+        self.assertEqual(authors("Homr"), ["Homer"])
+        self.assertEqual(authors("Joice"), ["James Joyce"])
+        self.assertEqual(authors("Tolsoy"), ["Leo Tolstoy"])
+        self.assertEqual(authors("Virgli"), ["Virgil"])
+        self.assertEqual(authors("Hmr"), [])  # Too short to allow a typo.
+        titles = [book["title"] for book in library.fuzzy_find_books("title", "Hamlte")]
+        self.assertEqual(titles, ["Hamlet", "Hamlet Revisited"])
+        titles = [book["title"] for book in library.fuzzy_find_books("title", "Hamlet")]
+        self.assertEqual(titles, ["Hamlet", "Hamlets", "Hamlet Revisited"])
+
+
+class SQLiteLibraryTestCase(unittest.TestCase):
+    def setUp(self):
+        """Import the global library into a scratch SQLite database."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmp.name, "library.json")
+        with open(routes.global_json) as f:
+            self.books = json.load(f)
+        with open(self.json_file, "w") as f:
+            json.dump(self.books, f)
+        self.db_file = os.path.join(self.tmp.name, "library.db")
+        import_json_library(self.json_file, self.db_file)
+        self.library = SQLiteLibrary(self.db_file)
+        self.json_library = Library(self.json_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_text_matches_ignore_case_and_accents(self):
+        """Text columns match like the JSON library's n-gram indexes."""
+        for criteria in (
+            {"author": "dostoevsky"},
+            {"author": "DOSTOÉVSKY"},
+            {"title": "anna karenina"},
+            {"language": "russian"},
+        ):
+            found = self.library.find_books(**criteria)
+            self.assertTrue(found, criteria)
+            self.assertEqual(found, self.json_library.find_books(**criteria))
+        predicates = parse_query("language=russian AND author~=tolstoy")
+        self.assertEqual(
+            self.library.query(predicates)[0],
+            self.json_library.query(predicates)[0],
+        )
+        self.assertEqual(
+            self.library.suggest("author", "FYODOR DOSTOÉ", 5), ["Fyodor Dostoevsky"]
+        )
+
+    def test_import_keeps_existing_rows(self):
+        """Importing again adds nothing and keeps reading progress."""
+        self.assertEqual(len(self.library), len(self.books))
+        uuid = self.books[0]["uuid"]
+        self.library.update_reading_status(uuid, 10)
+        self.assertEqual(
+            import_json_library(self.json_file, self.db_file), len(self.books)
+        )
+        self.assertEqual(len(self.library), len(self.books))
+        book = self.library.find_books(uuid=uuid)[0]
+        self.assertEqual(book["last_read_page"], 10)
+
+    def test_reads_match_the_json_library(self):
+        """Lookups, ranges, facets and rankings agree with the JSON backend."""
+        uuid = self.books[5]["uuid"]
+        self.assertEqual(
+            self.library.find_books(uuid=uuid), self.json_library.find_books(uuid=uuid)
+        )
+        self.assertEqual(self.library.find_books(uuid=uuid[:8]), [])
+        self.assertEqual(
+            self.library.find_books_by_uuid([uuid, "missing"]),
+            self.json_library.find_books_by_uuid([uuid, "missing"]),
+        )
+        self.assertEqual(
+            self.library.find_books_range("year", 1800, 1899, 2, 5),
+            self.json_library.find_books_range("year", 1800, 1899, 2, 5),
+        )
+        predicates = parse_query("year>=1800 AND pages<500")
+        self.assertEqual(
+            self.library.query(predicates)[0], self.json_library.query(predicates)[0]
+        )
+        self.assertEqual(
+            self.library.facets(["language", "decade"], predicates),
+            self.json_library.facets(["language", "decade"], predicates),
+        )
+        self.assertEqual(
+            self.library.top_books("pages", 3), self.json_library.top_books("pages", 3)
+        )
+        self.assertEqual(
+            self.library.fuzzy_find_books("author", "Tolsoy"),
+            self.json_library.fuzzy_find_books("author", "Tolsoy"),
+        )
+
+    def test_pages_survive_removals(self):
+        """Cursor pages walk every book once, even past a removed one."""
+        uuids, after_seq, after_uuid = [], None, None
+        while True:
+            page, last = self.library.list_books_page(
+                10, after_uuid, after_seq, fields=["uuid"]
+            )
+            uuids.extend(book["uuid"] for book in page)
+            if last is None:
+                break
+            after_seq, after_uuid = last
+        self.assertEqual(uuids, [book["uuid"] for book in self.books])
+
+        first, (seq, uuid) = self.library.list_books_page(2)
+        self.library.remove_book(uuid)
+        with self.assertRaises(KeyError):
+            self.library.list_books_page(2, after_uuid=uuid)
+        page, _ = self.library.list_books_page(2, after_uuid=uuid, after_seq=seq)
+        self.assertEqual(
+            [book["uuid"] for book in page], [book["uuid"] for book in self.books[2:4]]
+        )
+
+    def test_update_reading_status(self):
+        """The page, percentage and date are written and the generation bumped."""
+        book = next(book for book in self.books if book["pages"])
+        generation = self.library.generation
+        self.library.update_reading_status(book["uuid"], book["pages"] // 2)
+        updated = self.library.find_books(uuid=book["uuid"])[0]
+        self.assertEqual(updated["last_read_page"], book["pages"] // 2)
+        self.assertAlmostEqual(
+            updated["percentage_read"], book["pages"] // 2 / book["pages"] * 100
+        )
+        self.assertIsNotNone(updated["last_read_date"])
+        self.assertEqual(self.library.generation, generation + 1)
+
+    def test_database_without_folded_columns_is_upgraded(self):
+        """Opening a database made before the folded columns fills them in."""
+        old_file = os.path.join(self.tmp.name, "old.db")
+        with sqlite3.connect(old_file) as conn:
+            conn.execute(
+                f"CREATE TABLE books (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                f"uuid TEXT NOT NULL UNIQUE, "
+                f"{', '.join(c for c in sqlite_model.COLUMNS if c != 'uuid')})"
+            )
+            conn.execute(
+                "INSERT INTO books (uuid, author, title) VALUES (?, ?, ?)",
+                ("x", "Fyodor Dostoevsky", "The Idiot"),
+            )
+        conn.close()
+        found = SQLiteLibrary(old_file).find_books(author="dostoevsky", fields=["uuid"])
+        self.assertEqual(found, [{"uuid": "x"}])
+
 
 if __name__ == "__main__":
     unittest.main()